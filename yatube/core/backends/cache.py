@@ -0,0 +1,279 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from functools import lru_cache
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import connections
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires) '
+    'WHERE expires IS NOT NULL',
+    # Число и размер записей ведут триггеры: cull не пересчитывает таблицу
+    'CREATE TABLE IF NOT EXISTS cache_size ('
+    'id INTEGER PRIMARY KEY CHECK (id = 0), '
+    'entries INTEGER NOT NULL, bytes INTEGER NOT NULL)',
+    'CREATE TRIGGER IF NOT EXISTS cache_inserted AFTER INSERT ON cache '
+    'BEGIN UPDATE cache_size SET entries = entries + 1, '
+    'bytes = bytes + LENGTH(new.value); END',
+    'CREATE TRIGGER IF NOT EXISTS cache_deleted AFTER DELETE ON cache '
+    'BEGIN UPDATE cache_size SET entries = entries - 1, '
+    'bytes = bytes - LENGTH(old.value); END',
+    'CREATE TRIGGER IF NOT EXISTS cache_updated AFTER UPDATE OF value '
+    'ON cache BEGIN UPDATE cache_size '
+    'SET bytes = bytes + LENGTH(new.value) - LENGTH(old.value); END',
+)
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+@lru_cache(maxsize=None)
+def database_tag(name):
+    return f'{zlib.crc32(str(name).encode()):08x}'
+
+
+def database_key(key, key_prefix, version):
+    """KEY_FUNCTION: ключи помечены базой default.
+
+    Файл кэша общий для всех процессов машины, поэтому тесты и замеры
+    на временной базе не должны видеть версии и фрагменты рабочей.
+    """
+    name = connections['default'].settings_dict['NAME']
+    return f'{database_tag(name)}:{key_prefix}:{version}:{key}'
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов на машине.
+
+    LOCATION — путь к файлу. clear() удаляет только ключи этого кэша:
+    всё, что KEY_FUNCTION ставит перед версией (KEY_PREFIX, метку базы).
+    Целые числа хранятся как INTEGER, поэтому
+    incr атомарен между процессами одним UPDATE. Вытеснение — LRU по
+    времени последнего чтения; время обновляется не чаще раза в
+    ACCESS_GRANULARITY секунд, чтобы горячие ключи не превращали каждое
+    чтение в запись. Лимиты MAX_ENTRIES и MAX_BYTES проверяются раз в
+    CULL_EVERY записей соединения, поэтому могут ненадолго превышаться;
+    число и размер записей триггеры держат в строке cache_size.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_bytes = int(options.get('MAX_BYTES', 0))
+        self.cull_every = int(options.get('CULL_EVERY', 100))
+        self.access_granularity = float(options.get('ACCESS_GRANULARITY', 10))
+        self.timeout_seconds = float(options.get('BUSY_TIMEOUT', 5))
+        self.local = threading.local()
+
+    @property
+    def db(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork
+        local = self.local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout_seconds,
+                isolation_level=None, check_same_thread=False
+            )
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = OFF')
+            # Иначе INSERT OR REPLACE не вызывает триггер удаления
+            connection.execute('PRAGMA recursive_triggers = ON')
+            connection.execute('BEGIN IMMEDIATE')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            # Файл, созданный до cache_size, считается один раз
+            if connection.execute(
+                'SELECT 1 FROM cache_size'
+            ).fetchone() is None:
+                connection.execute(
+                    'INSERT INTO cache_size SELECT 0, COUNT(*), '
+                    'COALESCE(SUM(LENGTH(value)), 0) FROM cache'
+                )
+            connection.execute('COMMIT')
+            local.connection = connection
+            local.pid, local.writes = os.getpid(), 0
+        return local.connection
+
+    def encode(self, value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        found = self.fetch([self.key(key, version)])
+        return found[0][1] if found else default
+
+    def get_many(self, keys, version=None):
+        keys = {self.key(key, version): key for key in keys}
+        return {keys[key]: value for key, value in self.fetch(list(keys))}
+
+    def fetch(self, keys):
+        if not keys:
+            return []
+        now = time.time()
+        marks = ', '.join('?' * len(keys))
+        rows = self.db.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({marks}) AND {ALIVE}', (*keys, now)
+        ).fetchall()
+        stale = [
+            key for key, _, accessed in rows
+            if now - accessed > self.access_granularity
+        ]
+        if stale:
+            self.db.execute(
+                f'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({", ".join("?" * len(stale))})',
+                (now, *stale)
+            )
+        return [(key, self.decode(value)) for key, value, _ in rows]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self.key(key, version), self.encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)', rows
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self.wrote(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        cursor = self.db.execute(
+            'INSERT INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (self.key(key, version), self.encode(value),
+             self.get_backend_timeout(timeout), now, now)
+        )
+        self.wrote(cursor.rowcount)
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.db.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self.get_backend_timeout(timeout), self.key(key, version),
+             time.time())
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.key(key, version)
+        row = self.db.execute(
+            f'UPDATE cache SET value = value + ? WHERE key = ? AND {ALIVE} '
+            f"AND typeof(value) = 'integer' RETURNING value",
+            (delta, key, time.time())
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        # Не целое число (например, float): без атомарности, как в
+        # других бэкендах
+        found = self.fetch([key])
+        if not found:
+            raise ValueError(f"Key '{key}' not found")
+        value = found[0][1] + delta
+        self.db.execute(
+            'UPDATE cache SET value = ? WHERE key = ?',
+            (self.encode(value), key)
+        )
+        return value
+
+    def has_key(self, key, version=None):
+        return self.db.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (self.key(key, version), time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.key(key, version) for key in keys]
+        if keys:
+            marks = ', '.join('?' * len(keys))
+            self.db.execute(f'DELETE FROM cache WHERE key IN ({marks})', keys)
+
+    def scope(self):
+        """Начало ключей этого кэша: ключ без версии и собственного имени.
+
+        KEY_FUNCTION, как и стандартная, заканчивает ключ на
+        ':<версия>:<ключ>'.
+        """
+        return self.make_key('', version=0).rsplit(':', 2)[0] + ':'
+
+    def clear(self):
+        # Диапазон по первичному ключу: ':' + 1 == ';'
+        scope = self.scope()
+        self.db.execute(
+            'DELETE FROM cache WHERE key >= ? AND key < ?',
+            (scope, scope[:-1] + ';')
+        )
+
+    def close(self, **kwargs):
+        # Соединение живёт весь поток: открывать файл на каждый запрос дорого
+        pass
+
+    def wrote(self, count):
+        self.local.writes += count
+        if self.local.writes >= self.cull_every:
+            self.local.writes = 0
+            self.cull()
+
+    def cull(self):
+        db = self.db
+        db.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),)
+        )
+        count, size = db.execute(
+            'SELECT entries, bytes FROM cache_size'
+        ).fetchone()
+        if count <= self._max_entries and (
+            not self.max_bytes or size <= self.max_bytes
+        ):
+            return
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache')
+            return
+        db.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (max(count // self._cull_frequency, 1),)
+        )
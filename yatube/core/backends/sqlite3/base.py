@@ -0,0 +1,23 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite с настройками для конкурентной записи.
+
+    PRAGMAS из настроек базы выполняются на каждом новом соединении.
+    TRANSACTION_MODE задаёт вид BEGIN для atomic: с IMMEDIATE транзакция
+    берёт блокировку записи сразу и ждёт её в busy-обработчике. Отложенная
+    транзакция, которая сначала читает, а потом пишет, в режиме WAL
+    получает «database is locked» без ожидания, если кто-то успел
+    записать после её чтения.
+    """
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict.get('TRANSACTION_MODE')
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
@@ -0,0 +1,143 @@
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from core.backends.cache import SQLiteCache
+
+BACKENDS = ('locmem', 'file', 'sqlite')
+# Примерно фрагмент карточки ленты
+VALUE = 'x' * 2048
+
+
+def create(name, workdir):
+    params = {'OPTIONS': {'MAX_ENTRIES': 100_000}}
+    if name == 'locmem':
+        return LocMemCache(f'benchmark-{workdir}', params)
+    if name == 'file':
+        return FileBasedCache(os.path.join(workdir, 'file-cache'), params)
+    return SQLiteCache(os.path.join(workdir, 'cache.sqlite3'), params)
+
+
+def per_op(func, repeat):
+    start = time.perf_counter()
+    for number in range(repeat):
+        func(number)
+    return round((time.perf_counter() - start) / repeat * 1_000_000, 1)
+
+
+def operations(cache, repeat):
+    """Микросекунды на операцию в одном процессе."""
+    cache.clear()
+    keys = [f'op:{number}' for number in range(repeat)]
+    cache.set('counter', 0, None)
+    results = {
+        'set': per_op(lambda n: cache.set(keys[n], VALUE), repeat),
+        'get_hit': per_op(lambda n: cache.get(keys[n]), repeat),
+        'get_miss': per_op(lambda n: cache.get(f'miss:{n}'), repeat),
+        'get_many_10': per_op(
+            lambda n: cache.get_many(keys[n:n + 10]), repeat
+        ),
+        'incr': per_op(lambda n: cache.incr('counter'), repeat),
+    }
+    cache.clear()
+    return results
+
+
+def worker(name, workdir, keys, requests, seed):
+    """Чтение с досчётом при промахе, ключи — по степенному закону."""
+    cache = create(name, workdir)
+    rnd = random.Random(seed)
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        key = f'page:{int(keys * rnd.random() ** 3)}'
+        if cache.get(key) is None:
+            cache.set(key, VALUE)
+        else:
+            hits += 1
+    return hits, time.perf_counter() - start, cache.get('version')
+
+
+def shared(name, workdir, processes, keys, requests):
+    """Доля попаданий и видимость сброса для нескольких процессов."""
+    cache = create(name, workdir)
+    cache.clear()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(processes) as pool:
+        # Версию меняем до старта воркеров: общий кэш её покажет,
+        # у LocMem каждого процесса она своя
+        cache.set('version', 2)
+        parts = pool.starmap(worker, [
+            (name, workdir, keys, requests, seed)
+            for seed in range(processes)
+        ])
+    hits = sum(part[0] for part in parts)
+    total = processes * requests
+    return {
+        'hit_rate': round(hits / total, 4),
+        'rps': round(total / max(part[1] for part in parts)),
+        'sees_invalidation': all(part[2] == 2 for part in parts),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает LocMem, файловый кэш и SQLiteCache: время операций '
+        'и долю попаданий при нескольких процессах'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends', nargs='+', choices=BACKENDS, default=BACKENDS
+        )
+        parser.add_argument('--repeat', type=int, default=2000,
+                            help='Операций каждого вида в одном процессе')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--keys', type=int, default=1000,
+                            help='Размер пространства ключей')
+        parser.add_argument('--requests', type=int, default=5000,
+                            help='Чтений в каждом процессе')
+        parser.add_argument('--output', help='Записать итог в JSON-файл')
+
+    def handle(self, *args, backends, repeat, processes, keys, requests,
+               output, **options):
+        if processes < 1 or repeat < 1:
+            raise CommandError('Нужен хотя бы один процесс и одна операция')
+        workdir = tempfile.mkdtemp(prefix='yatube-cache-')
+        results = {}
+        try:
+            for name in backends:
+                results[name] = {
+                    'operations_us': operations(
+                        create(name, workdir), repeat
+                    ),
+                    'shared': shared(
+                        name, workdir, processes, keys, requests
+                    ),
+                }
+                self.report(name, results[name])
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        if output:
+            with open(output, 'w', encoding='utf-8') as target:
+                json.dump(results, target, ensure_ascii=False, indent=2)
+
+    def report(self, name, result):
+        self.stdout.write(f'{name}: ' + ' '.join(
+            f'{operation}={value} мкс'
+            for operation, value in result['operations_us'].items()
+        ))
+        shared = result['shared']
+        visible = 'да' if shared['sees_invalidation'] else 'нет'
+        self.stdout.write(
+            f'  {shared["rps"]} чтений/с, попаданий {shared["hit_rate"]:.1%}, '
+            f'сброс виден всем: {visible}'
+        )
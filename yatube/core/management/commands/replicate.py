@@ -0,0 +1,41 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def copy_database(source, target):
+    """Снимок SQLite-файла целиком через backup API — замена репликации."""
+    with closing(sqlite3.connect(source)) as primary, \
+            closing(sqlite3.connect(target)) as replica:
+        primary.backup(replica)
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует базу default в реплики REPLICA_DATABASES; с --interval '
+        'повторяет копирование, имитируя отставание реплик'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Пауза между копированиями, секунд; 0 — один раз'
+        )
+
+    def handle(self, *args, interval, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('Реплики не настроены: задайте YATUBE_REPLICAS')
+        source = connections['default'].settings_dict['NAME']
+        while True:
+            for alias in settings.REPLICA_DATABASES:
+                copy_database(source, connections[alias].settings_dict['NAME'])
+            self.stdout.write(
+                f'Скопировано в {", ".join(settings.REPLICA_DATABASES)}'
+            )
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,224 @@
+import contextvars
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.base import Template
+
+from . import routers
+
+logger = logging.getLogger('yatube.requests')
+
+current = contextvars.ContextVar('request_metrics', default=None)
+
+MISSING = object()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = Counter()
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # BaseCache.get_many вызывает get — не считаем ключи дважды
+        self.in_get_many = False
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.queries.items() if count > 1}
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries[sql] += 1
+
+
+def timed_render(render):
+    def wrapper(self, context):
+        metrics = current.get()
+        if metrics is None or metrics.template_depth:
+            return render(self, context)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+            metrics.template_depth -= 1
+    wrapper.instrumented = True
+    return wrapper
+
+
+def counted_get(get):
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, MISSING, version)
+        metrics = current.get()
+        if metrics is not None and not metrics.in_get_many:
+            if value is MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is MISSING else value
+    wrapper.instrumented = True
+    return wrapper
+
+
+def counted_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        metrics = current.get()
+        if metrics is None or metrics.in_get_many:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        metrics.in_get_many = True
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            metrics.in_get_many = False
+        metrics.cache_hits += len(found)
+        metrics.cache_misses += len(keys) - len(found)
+        return found
+    wrapper.instrumented = True
+    return wrapper
+
+
+def instrument():
+    """Один раз оборачивает рендер шаблонов и чтения из кэшей."""
+    if not getattr(Template.render, 'instrumented', False):
+        Template.render = timed_render(Template.render)
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if not getattr(backend.get, 'instrumented', False):
+            backend.get = counted_get(backend.get)
+        if not getattr(backend.get_many, 'instrumented', False):
+            backend.get_many = counted_get_many(backend.get_many)
+
+
+class RequestMetricsMiddleware:
+    """Число и время SQL-запросов, повторы (N+1), время шаблонов и кэш.
+
+    Работает без DEBUG: запросы считаются через execute_wrapper.
+    Итог — заголовок Server-Timing, строка лога и проверка бюджетов
+    QUERY_BUDGETS для представления.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        total = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        summary = {
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'queries': metrics.query_count,
+            'duplicates': max(metrics.duplicates.values(), default=0),
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'template_ms': round(metrics.template_time * 1000, 2),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+            'total_ms': round(total * 1000, 2),
+        }
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries"',
+            f'tpl;dur={summary["template_ms"]}',
+            f'cache;desc="hit {summary["cache_hits"]} '
+            f'miss {summary["cache_misses"]}"',
+            f'total;dur={summary["total_ms"]}',
+        ))
+        logger.info(json.dumps(summary, ensure_ascii=False))
+        self.check_budget(view_name, summary, metrics)
+        return response
+
+    def check_budget(self, view_name, summary, metrics):
+        budgets = settings.QUERY_BUDGETS
+        budget = budgets.get(view_name, budgets.get('*'))
+        if not budget:
+            return
+        exceeded = [
+            f'{key}={summary[key]} > {limit}'
+            for key, limit in budget.items() if summary[key] > limit
+        ]
+        if not exceeded:
+            return
+        message = f'{view_name}: превышен бюджет: {", ".join(exceeded)}'
+        if metrics.duplicates:
+            sql, count = max(metrics.duplicates.items(), key=lambda x: x[1])
+            message += f'; повтор x{count}: {sql[:200]}'
+        if settings.QUERY_BUDGET_MODE == 'fail':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ReplicaMiddleware:
+    """Выбирает реплику для чтения в представлениях из REPLICA_VIEWS.
+
+    После любой записи ставит cookie, и REPLICA_PIN_SECONDS все чтения
+    этого клиента идут с primary — он видит свои изменения, пока
+    реплики догоняют.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        current = routers.RequestState()
+        token = routers.state.set(current)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.state.reset(token)
+        if current.wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current = routers.state.get()
+        if (
+            current is not None and settings.REPLICA_DATABASES
+            and request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        ):
+            current.replica = random.choice(settings.REPLICA_DATABASES)
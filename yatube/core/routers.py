@@ -0,0 +1,41 @@
+import contextvars
+
+from django.conf import settings
+
+state = contextvars.ContextVar('replica_state', default=None)
+
+
+class RequestState:
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+class ReplicaRouter:
+    """Чтение в разрешённых представлениях — с реплики, остальное — с primary.
+
+    Реплику на запрос выбирает ReplicaMiddleware; вне запроса (команды,
+    сигналы после записи) state пуст и всё идёт в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        current = state.get()
+        if (
+            current is None or current.replica is None
+            or model._meta.app_label not in settings.REPLICA_APPS
+        ):
+            return 'default'
+        return current.replica
+
+    def db_for_write(self, model, **hints):
+        current = state.get()
+        if current is not None:
+            current.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему вместе с данными при репликации
+        return db not in settings.REPLICA_DATABASES
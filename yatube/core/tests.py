@@ -0,0 +1,314 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+from io import StringIO
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core import writer
+from core.backends.cache import SQLiteCache, database_key
+from core.backends.sqlite3.base import DatabaseWrapper
+from core.management.commands.replicate import copy_database
+from core.middleware import QueryBudgetExceeded, ReplicaMiddleware
+from core.routers import ReplicaRouter
+from posts.models import Post
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def test_server_timing_header(self):
+        """Ответ содержит Server-Timing с числом запросов."""
+        response = self.client.get('/')
+        self.assertIn('queries', response['Server-Timing'])
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:home_page': {'queries': 0}},
+        QUERY_BUDGET_MODE='fail',
+    )
+    def test_budget_fail_mode(self):
+        """В режиме fail превышение бюджета поднимает исключение."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/')
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:home_page': {'queries': 0}},
+        QUERY_BUDGET_MODE='warn',
+    )
+    def test_budget_warn_mode(self):
+        """В режиме warn превышение только пишется в лог."""
+        with self.assertLogs('yatube.requests', 'WARNING'):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def run_view(self, path, view_name, write=False, cookies=None):
+        """Прогоняет запрос через middleware, возвращает алиас чтения."""
+        seen = {}
+
+        def get_response(request):
+            middleware.process_view(request, None, (), {})
+            seen['read'] = self.router.db_for_read(Post)
+            seen['session'] = self.router.db_for_read(Session)
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(get_response)
+        request = self.factory.get(path)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = SimpleNamespace(view_name=view_name)
+        return middleware(request), seen
+
+    def test_feeds_read_from_replica(self):
+        """Ленты читают модели posts с реплики, сессии — с primary."""
+        _, seen = self.run_view('/', 'posts:home_page')
+        self.assertEqual(seen, {'read': 'replica1', 'session': 'default'})
+
+    def test_other_views_and_outside_requests_use_primary(self):
+        """Вне REPLICA_VIEWS и вне запроса чтение идёт с primary."""
+        _, seen = self.run_view('/create/', 'posts:post_create')
+        self.assertEqual(seen['read'], 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_write_pins_to_primary(self):
+        """После записи клиент получает cookie и читает с primary."""
+        response, _ = self.run_view(
+            '/profile/author/follow/', 'posts:profile_follow', write=True
+        )
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(
+            cookie['max-age'], settings.REPLICA_PIN_SECONDS
+        )
+        _, seen = self.run_view(
+            '/', 'posts:home_page',
+            cookies={settings.REPLICA_PIN_COOKIE: cookie.value}
+        )
+        self.assertEqual(seen['read'], 'default')
+
+
+class ReplicateTests(TestCase):
+    def test_copy_database(self):
+        """Копия SQLite-файла видит данные источника."""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'primary.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            with closing(sqlite3.connect(source)) as primary:
+                primary.execute('CREATE TABLE t (x)')
+                primary.execute('INSERT INTO t VALUES (1)')
+                primary.commit()
+            copy_database(source, target)
+            with closing(sqlite3.connect(target)) as replica:
+                self.assertEqual(
+                    replica.execute('SELECT x FROM t').fetchall(), [(1,)]
+                )
+
+
+class SqliteBackendTests(TestCase):
+    def test_pragmas_and_immediate_transactions(self):
+        """Соединение включает WAL, а транзакция сразу берёт запись."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'db.sqlite3')
+            wrapper = DatabaseWrapper(
+                {**connection.settings_dict, 'NAME': path}, 'tuned'
+            )
+            try:
+                wrapper.ensure_connection()
+                cursor = wrapper.connection.cursor()
+                self.assertEqual(
+                    cursor.execute('PRAGMA journal_mode').fetchone(),
+                    ('wal',)
+                )
+                self.assertEqual(
+                    cursor.execute('PRAGMA synchronous').fetchone(), (1,)
+                )
+                wrapper._start_transaction_under_autocommit()
+                with closing(sqlite3.connect(path, timeout=0)) as other:
+                    with self.assertRaises(sqlite3.OperationalError):
+                        other.execute('BEGIN IMMEDIATE')
+            finally:
+                wrapper.close()
+
+
+class WriterTests(TestCase):
+    def acquired_elsewhere(self):
+        result = []
+
+        def target():
+            result.append(writer.lock.acquire(blocking=False))
+            if result[0]:
+                writer.lock.release()
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+        return result[0]
+
+    @override_settings(WRITE_QUEUE=True)
+    def test_queue_serializes_threads(self):
+        """С очередью другой поток ждёт конца пишущей транзакции."""
+        with writer.atomic():
+            self.assertTrue(connection.in_atomic_block)
+            self.assertFalse(self.acquired_elsewhere())
+        self.assertTrue(self.acquired_elsewhere())
+
+    @override_settings(WRITE_QUEUE=False)
+    def test_without_queue(self):
+        """Без очереди остаётся обычная транзакция."""
+        with writer.atomic():
+            self.assertTrue(connection.in_atomic_block)
+            self.assertTrue(self.acquired_elsewhere())
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite3')
+        self.cache = self.open()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open(self, key_function=None, **options):
+        params = {'OPTIONS': options}
+        if key_function is not None:
+            params['KEY_FUNCTION'] = key_function
+        return SQLiteCache(self.path, params)
+
+    def test_basic_operations(self):
+        """get/set/add/get_many/delete ведут себя как у других бэкендов."""
+        cache = self.cache
+        cache.set('a', {'x': 1})
+        cache.set('n', 5)
+        self.assertEqual(cache.get('a'), {'x': 1})
+        self.assertIsNone(cache.get('missing'))
+        self.assertFalse(cache.add('a', 'other'))
+        self.assertTrue(cache.add('b', 'new'))
+        self.assertEqual(
+            cache.get_many(['a', 'b', 'missing']), {'a': {'x': 1}, 'b': 'new'}
+        )
+        self.assertEqual(cache.incr('n', 2), 7)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.delete('a')
+        self.assertFalse(cache.has_key('a'))
+
+    def test_expiry(self):
+        """Просроченный ключ не читается, а add его перезаписывает."""
+        self.cache.set('gone', 1, timeout=0)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertTrue(self.cache.add('gone', 2))
+        self.assertEqual(self.cache.get('gone'), 2)
+
+    def test_shared_between_instances(self):
+        """Другой экземпляр (процесс) видит записи и атомарный incr."""
+        other = self.open()
+        self.cache.set('version', 0)
+        threads = [
+            threading.Thread(target=lambda: [
+                other.incr('version') for _ in range(50)
+            ])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('version'), 200)
+        other.clear()
+        self.assertIsNone(self.cache.get('version'))
+
+    def test_lru_eviction(self):
+        """При превышении лимита вытесняются давно не читанные ключи."""
+        cache = self.open(
+            MAX_ENTRIES=4, CULL_FREQUENCY=2, CULL_EVERY=1,
+            ACCESS_GRANULARITY=0
+        )
+        for number in range(4):
+            cache.set(f'k{number}', number)
+            time.sleep(0.01)
+        cache.get('k0')
+        cache.set('k4', 4)
+        self.assertEqual(
+            sorted(cache.get_many([f'k{n}' for n in range(5)])),
+            ['k0', 'k3', 'k4']
+        )
+
+    def test_size_follows_writes(self):
+        """Число и размер записей в cache_size совпадают с пересчётом."""
+        cache = self.cache
+
+        def size():
+            return cache.db.execute(
+                'SELECT entries, bytes FROM cache_size'
+            ).fetchone()
+
+        def recount():
+            return cache.db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache'
+            ).fetchone()
+
+        cache.set_many({'a': 'short', 'b': 1})
+        cache.set('a', 'much longer value')
+        cache.set('gone', 1, timeout=0)
+        cache.add('gone', 'again')
+        cache.incr('b', 1000)
+        cache.delete('a')
+        self.assertEqual(size(), recount())
+        self.open().clear()
+        self.assertEqual(size(), (0, 0))
+
+    def test_keys_are_tagged_with_database(self):
+        """Ключи тестовой базы не совпадают с ключами рабочей."""
+        key = database_key('index', '', 1)
+        name = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = 'other.sqlite3'
+        try:
+            self.assertNotEqual(database_key('index', '', 1), key)
+        finally:
+            connection.settings_dict['NAME'] = name
+
+    def test_clear_keeps_other_databases(self):
+        """clear() удаляет только ключи своей базы, а не весь файл."""
+        tagged = self.open(key_function=database_key)
+        tagged.set('index', 1)
+        self.cache.set('index', 2)
+        name = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = 'other.sqlite3'
+        try:
+            other = self.open(key_function=database_key)
+            other.set('index', 3)
+            other.clear()
+            self.assertIsNone(other.get('index'))
+        finally:
+            connection.settings_dict['NAME'] = name
+        self.assertEqual(tagged.get('index'), 1)
+        self.assertEqual(self.cache.get('index'), 2)
+
+    def test_benchmark_command(self):
+        """Замер показывает, что сброс виден всем процессам только
+        у общего кэша."""
+        output = os.path.join(self.directory.name, 'result.json')
+        call_command(
+            'benchmark_cache', backends=['locmem', 'sqlite'], repeat=20,
+            processes=2, keys=10, requests=50, output=output,
+            stdout=StringIO()
+        )
+        with open(output, encoding='utf-8') as source:
+            results = json.load(source)
+        self.assertFalse(results['locmem']['shared']['sees_invalidation'])
+        self.assertTrue(results['sqlite']['shared']['sees_invalidation'])
@@ -0,0 +1,23 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+lock = threading.RLock()
+
+
+@contextmanager
+def atomic(using=None):
+    """Короткая пишущая транзакция.
+
+    С WRITE_QUEUE потоки процесса входят в неё по одному: остальные ждут
+    на блокировке Python, а не опрашивают занятую базу в busy-обработчике
+    SQLite. Между процессами порядок по-прежнему держит сама база.
+    """
+    if not settings.WRITE_QUEUE:
+        with transaction.atomic(using=using):
+            yield
+        return
+    with lock, transaction.atomic(using=using):
+        yield
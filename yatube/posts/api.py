@@ -0,0 +1,95 @@
+from django.conf import settings as s
+from django.core.files.storage import default_storage
+
+from .utils import KeysetPaginator, decode_cursor, encode_cursor
+
+# Поле ответа → путь для values_list
+FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'html': 'text_html',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    pass
+
+
+def parse_fields(value):
+    if not value:
+        return tuple(FIELDS)
+    fields = tuple(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()
+    ))
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown or not fields:
+        raise ApiError(
+            f'Неизвестные поля: {", ".join(unknown)}; '
+            f'доступны: {", ".join(FIELDS)}'
+        )
+    return fields
+
+
+def parse_limit(value):
+    if not value:
+        return s.COUNT_OBJECTS
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def serializer(fields):
+    """Колонки для values_list и функция, собирающая из кортежа словарь.
+
+    pk и pub_date нужны курсору, поэтому выбираются всегда — в конце
+    кортежа, если клиент их не просил.
+    """
+    columns = [FIELDS[name] for name in fields]
+    extra = [column for column in ('pk', 'pub_date') if column not in columns]
+    columns += extra
+
+    def build(row):
+        item = dict(zip(fields, row))
+        if 'image' in item:
+            item['image'] = (
+                default_storage.url(item['image']) if item['image']
+                else None
+            )
+        return item
+
+    def cursor(row):
+        return encode_cursor(
+            row[columns.index('pub_date')], row[columns.index('pk')]
+        )
+
+    return columns, build, cursor
+
+
+def page(posts, fields, after=None, limit=None):
+    """Страница ленты по курсору: {'results': [...], 'next': курсор}."""
+    columns, build, cursor = serializer(fields)
+    posts = posts.order_by('-pub_date', '-pk')
+    if after:
+        position = decode_cursor(after)
+        if position is None:
+            raise ApiError('Неверный курсор')
+        posts = KeysetPaginator.after(posts, *position)
+    rows = list(posts.values_list(*columns)[:limit + 1])
+    return {
+        'results': [build(row) for row in rows[:limit]],
+        'next': cursor(rows[limit - 1]) if len(rows) > limit else None,
+    }
+
+
+def detail(posts, post_id, fields):
+    columns, build, _ = serializer(fields)
+    row = posts.filter(pk=post_id).values_list(*columns).first()
+    return None if row is None else build(row)
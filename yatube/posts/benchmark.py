@@ -0,0 +1,293 @@
+import gc
+import math
+import platform
+import time
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings as s
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import markup, rows, timeline
+from .models import Follow, Group, Post
+from .utils import keep_dates
+
+User = get_user_model()
+
+POST_SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+FOLLOW_SCALES = {'10': 10, '1k': 1_000, '10k': 10_000}
+VIEWS = (
+    'posts:home_page',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+)
+# JSON-аналоги лент: замеряются по --views, для сравнения с HTML
+API_VIEWS = (
+    'posts:api_index',
+    'posts:api_group',
+    'posts:api_profile',
+    'posts:api_post',
+    'posts:api_follow',
+)
+GROUPS = 20
+MIN_AUTHORS = 100
+BATCH_SIZE = 5000
+LATENCIES = ('p50', 'p95', 'p99')
+ROW_MODES = ('models', 'records')
+# Метрики, по которым сравнение с эталоном ищет регрессии
+COMPARED = LATENCIES + ('queries', 'peak_kb')
+
+
+def parse_scale(value, scales):
+    """'1k' → 1000; допускается и просто число."""
+    if value in scales:
+        return scales[value]
+    return int(value)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def batched(objects, size=BATCH_SIZE):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def text(number):
+    return f'Пост номер {number} для замеров производительности'
+
+
+def seed(posts, follows):
+    """Синтетический набор: posts постов, читатель с follows подписками.
+
+    Записи создаются bulk_create без сигналов, производные данные
+    (счётчики, лента) пересобираются в конце, как при импорте.
+    """
+    authors_count = max(follows, MIN_AUTHORS)
+    now = timezone.now()
+    with transaction.atomic():
+        User.objects.bulk_create(
+            User(username=f'bench-author-{i}', password='!')
+            for i in range(authors_count)
+        )
+        reader = User.objects.create(username='bench-reader', password='!')
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'bench-{i}',
+                  description='Группа для замеров')
+            for i in range(GROUPS)
+        )
+    authors = list(User.objects.filter(
+        username__startswith='bench-author-'
+    ).order_by('pk').values_list('pk', flat=True))
+    groups = list(Group.objects.filter(
+        slug__startswith='bench-'
+    ).order_by('pk').values_list('pk', flat=True))
+    for batch in batched(
+        Follow(user=reader, author_id=author_id)
+        for author_id in authors[:follows]
+    ):
+        Follow.objects.bulk_create(batch)
+    with keep_dates(
+        Post._meta.get_field('pub_date'), Post._meta.get_field('updated')
+    ):
+        for batch in batched(
+            Post(
+                author_id=authors[i % authors_count],
+                group_id=groups[i % GROUPS] if i % 3 else None,
+                text=text(i),
+                **markup.rendered(Post, text(i)),
+                pub_date=now - timedelta(minutes=i),
+                updated=now - timedelta(minutes=i),
+            )
+            for i in range(posts)
+        ):
+            with transaction.atomic():
+                Post.objects.bulk_create(batch)
+    call_command('reconcile_stats', stdout=StringIO())
+    timeline.rebuild(reader.pk)
+    cache.clear()
+    return reader
+
+
+def targets():
+    author = User.objects.filter(
+        username__startswith='bench-author-'
+    ).order_by('pk').first()
+    group = Group.objects.filter(slug__startswith='bench-').first()
+    post = Post.objects.filter(author=author).order_by('pk').first()
+    return {
+        'posts:home_page': reverse('posts:home_page'),
+        'posts:group_posts': reverse('posts:group_posts', args=[group.slug]),
+        'posts:profile': reverse('posts:profile', args=[author.username]),
+        'posts:post_detail': reverse('posts:post_detail', args=[post.pk]),
+        'posts:follow_index': reverse('posts:follow_index'),
+        'posts:api_index': reverse('posts:api_index'),
+        'posts:api_group': reverse('posts:api_group', args=[group.slug]),
+        'posts:api_profile': reverse(
+            'posts:api_profile', args=[author.username]
+        ),
+        'posts:api_post': reverse('posts:api_post', args=[post.pk]),
+        'posts:api_follow': reverse('posts:api_follow'),
+    }
+
+
+def measure(client, url, repeat, cold):
+    """Задержки (мс), число запросов и пик памяти (КБ) для одного URL.
+
+    Пик памяти снимается отдельным проходом: tracemalloc заметно
+    замедляет выполнение и исказил бы задержки.
+    """
+    latencies, queries = [], []
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: статус {response.status_code}')
+        queries.append(len(captured))
+    if cold:
+        cache.clear()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50': round(percentile(latencies, 50), 3),
+        'p95': round(percentile(latencies, 95), 3),
+        'p99': round(percentile(latencies, 99), 3),
+        'queries': max(queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run(reader, repeat=50, cold=False, views=VIEWS):
+    client = Client()
+    client.force_login(reader)
+    urls = targets()
+    return {view: measure(client, urls[view], repeat, cold) for view in views}
+
+
+def feeds(reader):
+    """Querysets лент в том виде, в каком их строят представления."""
+    author = User.objects.filter(
+        username__startswith='bench-author-'
+    ).order_by('pk').first()
+    group = Group.objects.filter(slug__startswith='bench-').first()
+    return {
+        'index': Post.objects.select_related('author', 'group'),
+        'group_posts': group.posts.select_related('author'),
+        'profile': author.posts.select_related('group'),
+        'follow_index': timeline.feed(reader).select_related(
+            'author', 'group'
+        ),
+    }
+
+
+def build_page(posts, mode):
+    with override_settings(FEED_ROWS=mode):
+        page = list(rows.for_feed(posts)[:s.COUNT_OBJECTS])
+    # Как карточка: автор, группа и картинка каждого поста
+    for post in page:
+        post.author.username, post.group, post.image
+    return page
+
+
+def materialize(reader, repeat=50):
+    """Сборка страницы ленты: экземпляры Post против PostRow.
+
+    Время — с запросом к базе; память — пик выделений tracemalloc
+    на одну страницу и сколько из них держит готовая страница.
+    """
+    results = {}
+    for name, posts in feeds(reader).items():
+        results[name] = {}
+        for mode in ROW_MODES:
+            latencies = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                build_page(posts, mode)
+                latencies.append((time.perf_counter() - start) * 1000)
+            gc.collect()
+            tracemalloc.start()
+            try:
+                page = build_page(posts, mode)
+                kept, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            results[name][mode] = {
+                'p50': round(percentile(latencies, 50), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'peak_kb': round(peak / 1024, 1),
+                'kept_kb': round(kept / 1024, 1),
+                'rows': len(page),
+            }
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        'cache': s.CACHES['default']['BACKEND'],
+        'pagination': s.PAGINATION_MODE,
+        'follow_feed': s.FOLLOW_FEED,
+    }
+
+
+def compare(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """Список регрессий current относительно baseline.
+
+    Задержки сравниваются с допуском threshold (доля) и не меньше
+    min_delta_ms, чтобы шум на быстрых страницах не считался регрессией;
+    память — с тем же допуском. Число запросов детерминировано, поэтому
+    регрессия — любой лишний запрос.
+    """
+    regressions = []
+    for dataset, views in current.items():
+        for view, metrics in views.items():
+            before = baseline.get(dataset, {}).get(view)
+            if before is None:
+                continue
+            for metric in COMPARED:
+                old, new = before.get(metric), metrics.get(metric)
+                if old is None or new is None:
+                    continue
+                limit = old * (1 + threshold)
+                if metric == 'queries':
+                    limit = old
+                elif metric in LATENCIES:
+                    limit = max(limit, old + min_delta_ms)
+                if new > limit:
+                    regressions.append({
+                        'dataset': dataset,
+                        'view': view,
+                        'metric': metric,
+                        'baseline': old,
+                        'current': new,
+                    })
+    return regressions
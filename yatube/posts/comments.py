@@ -0,0 +1,20 @@
+from . import page_cache, stamps, stats
+from .models import Post
+
+
+def removed(post_ids):
+    """Учёт комментариев, удалённых через ORM: один проход на удаление.
+
+    post_ids — Counter {id поста: сколько комментариев удалено}.
+    """
+    if not post_ids:
+        return
+    for post_id, count in post_ids.items():
+        stats.bump_comments(post_id, -count)
+    stamps.touch(*(f'post:{post_id}' for post_id in post_ids), fan_out=False)
+    namespaces = set()
+    for author_id, group_id in Post.objects.filter(
+        pk__in=list(post_ids)
+    ).values_list('author_id', 'group_id'):
+        namespaces.update(page_cache.post_namespaces(author_id, group_id))
+    page_cache.bump(*namespaces, fan_out=False)
@@ -0,0 +1,75 @@
+import csv
+import json
+
+from django.conf import settings as s
+
+from .models import Comment, Post
+
+FIELDS = (
+    'type', 'id', 'author', 'group', 'post', 'text', 'pub_date', 'created',
+    'image',
+)
+
+
+def records(posts, comments):
+    """Записи в формате import_yatube; в памяти не больше одной пачки."""
+    for pk, author, group, text, pub_date, image in posts.values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date', 'image'
+    ).order_by('pk').iterator(chunk_size=s.EXPORT_CHUNK_SIZE):
+        yield {
+            'type': 'post',
+            'id': pk,
+            'author': author,
+            'group': group,
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'image': image,
+        }
+    for author, post_id, text, created in comments.values_list(
+        'author__username', 'post_id', 'text', 'created'
+    ).order_by('post_id', 'pk').iterator(chunk_size=s.EXPORT_CHUNK_SIZE):
+        yield {
+            'type': 'comment',
+            'author': author,
+            'post': post_id,
+            'text': text,
+            'created': created.isoformat(),
+        }
+
+
+def author_records(author):
+    return records(
+        Post.objects.filter(author=author),
+        Comment.objects.filter(post__author=author),
+    )
+
+
+def group_records(group):
+    return records(
+        Post.objects.filter(group=group),
+        Comment.objects.filter(post__group=group),
+    )
+
+
+def as_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def as_csv(rows):
+    writer = csv.DictWriter(Echo(), FIELDS)
+    # writeheader() возвращает строку только с Python 3.8
+    yield writer.writerow(dict(zip(FIELDS, FIELDS)))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+FORMATS = {
+    'ndjson': (as_ndjson, 'application/x-ndjson'),
+    'csv': (as_csv, 'text/csv'),
+}
@@ -0,0 +1,115 @@
+from django.conf import settings as s
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from core import writer
+
+from . import merge, stamps, stats, timeline
+from .models import Follow
+
+User = get_user_model()
+
+
+def touched(user_id, author_id):
+    # Лента подписчика и счётчики в обоих профилях
+    stamps.touch(
+        f'follow:{user_id}', f'author:{user_id}', f'author:{author_id}',
+        fan_out=False
+    )
+
+
+def followed(user_id, author_id):
+    touched(user_id, author_id)
+    stats.bump(user_id, follows_count=1)
+    stats.bump(author_id, followers_count=1)
+    merge.invalidate_following(user_id)
+    if s.FOLLOW_FEED == 'timeline':
+        timeline.backfill(user_id, author_id)
+
+
+def unfollowed(user_id, author_id):
+    touched(user_id, author_id)
+    stats.bump(user_id, create=False, follows_count=-1)
+    stats.bump(author_id, create=False, followers_count=-1)
+    merge.invalidate_following(user_id)
+    timeline.remove(user_id, author_id)
+
+
+def removed(pairs):
+    """Учёт подписок, удалённых через ORM (админка, queryset.delete())."""
+    for user_id, author_id in pairs:
+        unfollowed(user_id, author_id)
+
+
+def user_removing(user_id):
+    """Перед удалением пользователя: кто на него подписан и на кого он.
+
+    Подписки уйдут каскадом одним DELETE; ленты подписчиков отмечаются,
+    пока строки Follow ещё есть.
+    """
+    followers = list(Follow.objects.filter(author_id=user_id).values_list(
+        'user_id', flat=True
+    ))
+    following = list(Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True
+    ))
+    stamps.touch(f'author:{user_id}')
+    return followers, following
+
+
+def user_removed(followers, following):
+    """После каскада: счётчики и кэши затронутых профилей разом.
+
+    Записи лент удалились вместе с постами и самим пользователем,
+    обрезать их не нужно.
+    """
+    stats.bump_many(followers, follows_count=-1)
+    stats.bump_many(following, followers_count=-1)
+    stamps.touch(
+        *(f'author:{user_id}' for user_id in followers + following),
+        fan_out=False
+    )
+    merge.invalidate_following(*followers)
+
+
+def execute(sql, params):
+    qn = connection.ops.quote_name
+    sql = sql.format(
+        follow=qn(Follow._meta.db_table), user=qn(User._meta.db_table)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def follow(user, username):
+    """Подписка одним INSERT; id автора, если подписка создана.
+
+    Повторная подписка и подписка на себя ничего не меняют — в ответ None.
+    """
+    with writer.atomic():
+        author_id = execute(
+            'INSERT INTO {follow} (user_id, author_id) '
+            'SELECT %s, id FROM {user} WHERE username = %s AND id <> %s '
+            'ON CONFLICT (user_id, author_id) DO NOTHING '
+            'RETURNING author_id',
+            (user.pk, username, user.pk)
+        )
+        if author_id is not None:
+            followed(user.pk, author_id)
+    return author_id
+
+
+def unfollow(user, username):
+    """Отписка одним DELETE; id автора, если подписка была."""
+    with writer.atomic():
+        author_id = execute(
+            'DELETE FROM {follow} WHERE user_id = %s AND author_id IN '
+            '(SELECT id FROM {user} WHERE username = %s) '
+            'RETURNING author_id',
+            (user.pk, username)
+        )
+        if author_id is not None:
+            unfollowed(user.pk, author_id)
+    return author_id
@@ -15,3 +15,11 @@ class CommentForm(forms.ModelForm):
         fields = ('text',)
         labels = {'text': 'Текст комментария'}
         help_texts = {'text': 'Текст нового комментария'}
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(
+        label='Поиск',
+        max_length=200,
+        help_text='Слова из текста поста'
+    )
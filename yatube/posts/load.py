@@ -0,0 +1,309 @@
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from http import HTTPStatus
+from io import BytesIO
+from urllib.parse import urlencode
+
+from django.conf import settings as s
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+)
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from .benchmark import percentile
+from .models import Group, Post
+
+User = get_user_model()
+
+DEFAULT_MIX = 'read=90,post=4,comment=5,follow=1'
+OPERATIONS = ('read', 'post', 'comment', 'follow')
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+# Верхние границы корзин гистограммы задержек, мс
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# Профили базы для сравнения: stock — SQLite как есть, tuned — настройки
+# из DATABASES, queue — они же плюс очередь записи в процессе.
+PROFILES = {
+    'stock': {
+        'database': {'OPTIONS': {}, 'PRAGMAS': {}, 'TRANSACTION_MODE': None},
+        'write_queue': False,
+    },
+    'tuned': {'database': {}, 'write_queue': False},
+    'queue': {'database': {}, 'write_queue': True},
+}
+
+
+def parse_mix(value):
+    """'read=90,post=5' → {'read': 90, 'post': 5}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f'неизвестная операция: {name}')
+        mix[name] = int(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError('сумма весов должна быть положительной')
+    return mix
+
+
+def histogram(latencies):
+    counts = Counter()
+    for latency in latencies:
+        bucket = next((b for b in BUCKETS if latency <= b), None)
+        counts[f'<={bucket}' if bucket else f'>{BUCKETS[-1]}'] += 1
+    labels = [f'<={b}' for b in BUCKETS] + [f'>{BUCKETS[-1]}']
+    return {label: counts[label] for label in labels if counts[label]}
+
+
+@contextmanager
+def profile(name, settings_dict):
+    """Временно применяет профиль к настройкам базы и очереди записи."""
+    changes = PROFILES[name]['database']
+    saved = {key: settings_dict.get(key) for key in changes}
+    settings_dict.update(changes)
+    try:
+        with override_settings(WRITE_QUEUE=PROFILES[name]['write_queue']):
+            yield
+    finally:
+        settings_dict.update(saved)
+
+
+class Session:
+    """Cookie авторизованного пользователя без прохода через форму входа.
+
+    Секрет CSRF длиной 32 символа Django принимает и в cookie,
+    и в заголовке X-CSRFToken.
+    """
+
+    def __init__(self, user):
+        store = SessionStore()
+        store[SESSION_KEY] = str(user.pk)
+        store[BACKEND_SESSION_KEY] = s.AUTHENTICATION_BACKENDS[0]
+        store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        store.create()
+        self.user_id = user.pk
+        self.csrf = get_random_string(32)
+        self.cookie = (
+            f'{s.SESSION_COOKIE_NAME}={store.session_key}; '
+            f'{s.CSRF_COOKIE_NAME}={self.csrf}'
+        )
+
+
+def call(app, session, method, path, data=None):
+    """Один запрос к WSGI-приложению, возвращает код ответа."""
+    body = urlencode(data or {}).encode()
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_COOKIE': session.cookie,
+        'HTTP_X_CSRFTOKEN': session.csrf,
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': BytesIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    status = []
+
+    def start_response(line, headers, exc_info=None):
+        status.append(int(line[:3]))
+
+    result = app(environ, start_response)
+    try:
+        for _ in result:
+            pass
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return status[0]
+
+
+class Targets:
+    """Адреса для операций смеси, выбираются заново на каждый запрос."""
+
+    def __init__(self):
+        self.usernames = list(User.objects.values_list('username', flat=True))
+        self.slugs = list(Group.objects.values_list('slug', flat=True))
+        self.post_ids = list(Post.objects.values_list('pk', flat=True))
+
+    def read(self, rnd):
+        choice = rnd.randrange(5)
+        if choice == 0:
+            return 'GET', reverse('posts:home_page'), None
+        if choice == 1:
+            return 'GET', reverse(
+                'posts:group_posts', args=[rnd.choice(self.slugs)]
+            ), None
+        if choice == 2:
+            return 'GET', reverse(
+                'posts:profile', args=[rnd.choice(self.usernames)]
+            ), None
+        if choice == 3:
+            return 'GET', reverse(
+                'posts:post_detail', args=[rnd.choice(self.post_ids)]
+            ), None
+        return 'GET', reverse('posts:follow_index'), None
+
+    def post(self, rnd):
+        return 'POST', reverse('posts:post_create'), {
+            'text': f'Пост под нагрузкой {rnd.random()}',
+            'group': '',
+        }
+
+    def comment(self, rnd):
+        return 'POST', reverse(
+            'posts:add_comment', args=[rnd.choice(self.post_ids)]
+        ), {'text': f'Комментарий под нагрузкой {rnd.random()}'}
+
+    def follow(self, rnd):
+        username = rnd.choice(self.usernames)
+        view = 'posts:profile_follow' if rnd.random() < 0.7 else (
+            'posts:profile_unfollow'
+        )
+        return 'GET', reverse(view, args=[username]), None
+
+
+class Recorder:
+    """Задержки и ошибки одного потока плюс время пишущих SQL-операторов.
+
+    Ожидание блокировки SQLite происходит внутри busy-обработчика
+    оператора, поэтому время пишущих операторов — верхняя оценка
+    ожидания блокировки.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.locked = Counter()
+        self.lock_waits = []
+        self.operation = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as error:
+            if 'locked' in str(error):
+                self.locked[self.operation] += 1
+            raise
+        finally:
+            if sql.lstrip().upper().startswith(WRITES):
+                self.lock_waits.append((time.perf_counter() - start) * 1000)
+
+
+def worker(app, sessions, targets, mix, duration, seed):
+    """Цикл одного потока до истечения duration секунд."""
+    rnd = random.Random(seed)
+    recorder = Recorder()
+    names, weights = zip(*mix.items())
+    deadline = time.perf_counter() + duration
+    try:
+        with connection.execute_wrapper(recorder):
+            while time.perf_counter() < deadline:
+                operation = rnd.choices(names, weights)[0]
+                method, path, data = getattr(targets, operation)(rnd)
+                recorder.operation = operation
+                start = time.perf_counter()
+                status = call(app, rnd.choice(sessions), method, path, data)
+                recorder.latencies[operation].append(
+                    (time.perf_counter() - start) * 1000
+                )
+                # 404 при отписке от того, на кого не подписан, — не ошибка
+                if status >= 500 or status == HTTPStatus.FORBIDDEN:
+                    recorder.errors[operation] += 1
+    finally:
+        connection.close()
+    return recorder
+
+
+def run_process(sessions, targets, mix, duration, threads, seed):
+    """Пул потоков одного процесса; итог — простые структуры для pickle."""
+    from yatube.wsgi import application
+
+    recorders = [None] * threads
+
+    def target(index):
+        recorders[index] = worker(
+            application, sessions, targets, mix, duration, seed + index
+        )
+
+    pool = [
+        threading.Thread(target=target, args=(index,))
+        for index in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    merged = {'latencies': defaultdict(list), 'errors': Counter(),
+              'locked': Counter(), 'lock_waits': []}
+    for recorder in filter(None, recorders):
+        for operation, values in recorder.latencies.items():
+            merged['latencies'][operation].extend(values)
+        merged['errors'].update(recorder.errors)
+        merged['locked'].update(recorder.locked)
+        merged['lock_waits'].extend(recorder.lock_waits)
+    return merged
+
+
+def write_rps(summary):
+    return round(sum(
+        metrics['rps'] for operation, metrics in summary['operations'].items()
+        if operation != 'read'
+    ), 1)
+
+
+def summarize(parts, elapsed):
+    latencies, errors, locked = defaultdict(list), Counter(), Counter()
+    lock_waits = []
+    for part in parts:
+        for operation, values in part['latencies'].items():
+            latencies[operation].extend(values)
+        errors.update(part['errors'])
+        locked.update(part['locked'])
+        lock_waits.extend(part['lock_waits'])
+    operations = {}
+    for operation, values in sorted(latencies.items()):
+        operations[operation] = {
+            'requests': len(values),
+            'rps': round(len(values) / elapsed, 1),
+            'errors': errors[operation],
+            'error_rate': round(errors[operation] / len(values), 4),
+            'locked': locked[operation],
+            'p50': round(percentile(values, 50), 2),
+            'p95': round(percentile(values, 95), 2),
+            'p99': round(percentile(values, 99), 2),
+            'histogram': histogram(values),
+        }
+    total = sum(len(values) for values in latencies.values())
+    return {
+        'elapsed': round(elapsed, 2),
+        'requests': total,
+        'rps': round(total / elapsed, 1) if elapsed else 0,
+        'errors': sum(errors.values()),
+        'locked': sum(locked.values()),
+        'lock_wait': {
+            'statements': len(lock_waits),
+            'p50': round(percentile(lock_waits, 50), 2) if lock_waits else 0,
+            'p99': round(percentile(lock_waits, 99), 2) if lock_waits else 0,
+            'max': round(max(lock_waits, default=0), 2),
+        },
+        'operations': operations,
+    }
@@ -0,0 +1,127 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment
+)
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеры index, group_posts, profile, post_detail и follow_index '
+        'на синтетических данных разного масштаба во временной базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', nargs='+', default=['1k'],
+            help=f'Число постов: {", ".join(benchmark.POST_SCALES)} '
+                 'или число'
+        )
+        parser.add_argument(
+            '--follows', nargs='+', default=['10'],
+            help=f'Подписок у читателя: {", ".join(benchmark.FOLLOW_SCALES)} '
+                 'или число'
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом'
+        )
+        parser.add_argument(
+            '--api', action='store_true',
+            help='Замерять и JSON-ленты из /api/ рядом с HTML'
+        )
+        parser.add_argument(
+            '--rows', action='store_true',
+            help='Сравнить сборку страниц из Post и из PostRow'
+        )
+        parser.add_argument(
+            '--output', help='Записать результаты в JSON-файл (эталон)'
+        )
+        parser.add_argument(
+            '--compare', dest='baseline',
+            help='Сравнить с эталоном и завершиться ошибкой при регрессии'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост задержек и памяти, доля (0.2 = 20%%)'
+        )
+
+    def handle(self, *args, posts, follows, repeat, cold, api, rows,
+               output, baseline, threshold, **options):
+        try:
+            datasets = [
+                (benchmark.parse_scale(post_scale, benchmark.POST_SCALES),
+                 benchmark.parse_scale(follow_scale, benchmark.FOLLOW_SCALES),
+                 f'{post_scale}/{follow_scale}')
+                for post_scale in posts for follow_scale in follows
+            ]
+        except ValueError as error:
+            raise CommandError(f'Неверный масштаб: {error}')
+        views = benchmark.VIEWS + (benchmark.API_VIEWS if api else ())
+        results = {}
+        # Как в тестах: без DEBUG и панели отладки, чтобы не мерить их.
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            for post_count, follow_count, name in datasets:
+                self.stdout.write(f'{name}: заполнение...')
+                reader = benchmark.seed(post_count, follow_count)
+                results[name] = benchmark.run(
+                    reader, repeat, cold, views
+                )
+                self.report(name, results[name])
+                if rows:
+                    self.report_rows(benchmark.materialize(reader, repeat))
+                call_command('flush', interactive=False, verbosity=0)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if output:
+            with open(output, 'w', encoding='utf-8') as target:
+                json.dump({
+                    'environment': benchmark.environment(),
+                    'repeat': repeat,
+                    'cold': cold,
+                    'results': results,
+                }, target, ensure_ascii=False, indent=2)
+        if baseline:
+            self.compare(baseline, results, threshold)
+
+    def report(self, name, views):
+        for view, metrics in views.items():
+            self.stdout.write(
+                f'  {view:<20} p50={metrics["p50"]:.1f} '
+                f'p95={metrics["p95"]:.1f} p99={metrics["p99"]:.1f} мс, '
+                f'запросов {metrics["queries"]}, '
+                f'пик {metrics["peak_kb"]:.0f} КБ'
+            )
+
+    def report_rows(self, feeds):
+        for feed, modes in feeds.items():
+            for mode, metrics in modes.items():
+                self.stdout.write(
+                    f'  {feed:<13} {mode:<8} p50={metrics["p50"]:.2f} '
+                    f'p99={metrics["p99"]:.2f} мс, '
+                    f'пик {metrics["peak_kb"]:.0f} КБ, '
+                    f'держит {metrics["kept_kb"]:.0f} КБ '
+                    f'на {metrics["rows"]} строк'
+                )
+
+    def compare(self, path, results, threshold):
+        with open(path, encoding='utf-8') as source:
+            baseline = json.load(source)['results']
+        regressions = benchmark.compare(baseline, results, threshold)
+        for item in regressions:
+            self.stderr.write(
+                f'{item["dataset"]} {item["view"]} {item["metric"]}: '
+                f'{item["baseline"]} → {item["current"]}'
+            )
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
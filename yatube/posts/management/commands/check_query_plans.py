@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет EXPLAIN QUERY PLAN запросов лент: ни полного прохода '
+        'таблицы, ни сортировки во временном B-дереве'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка рассчитана на SQLite')
+        failed = 0
+        for name, (plan, problems) in query_plans.check().items():
+            style = self.style.ERROR if problems else self.style.SUCCESS
+            self.stdout.write(style(name))
+            for line in plan:
+                self.stdout.write(f'  {line}')
+            for problem in problems:
+                self.stderr.write(f'  ! {problem}')
+            failed += bool(problems)
+        if failed:
+            raise CommandError(f'Запросов с плохим планом: {failed}')
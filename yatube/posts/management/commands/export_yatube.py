@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка постов и комментариев автора или группы'
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group(required=True)
+        scope.add_argument('--author', help='Имя пользователя')
+        scope.add_argument('--group', help='Slug группы')
+        parser.add_argument(
+            '--format', dest='output_format', choices=tuple(export.FORMATS),
+            default='ndjson'
+        )
+        parser.add_argument('--output', default='-', help='Файл или "-"')
+
+    def handle(self, *args, author, group, output_format, output, **options):
+        if author is not None:
+            try:
+                rows = export.author_records(User.objects.get(username=author))
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {author} не найден')
+        else:
+            try:
+                rows = export.group_records(Group.objects.get(slug=group))
+            except Group.DoesNotExist:
+                raise CommandError(f'Группа {group} не найдена')
+        render_rows, _ = export.FORMATS[output_format]
+        chunks = render_rows(rows)
+        if output == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(output, 'w', encoding='utf-8', newline='') as stream:
+            stream.writelines(chunks)
@@ -0,0 +1,145 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment
+)
+
+from posts import benchmark, load
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Смешанная нагрузка чтения и записи на WSGI-приложение из потоков '
+        'и процессов во временной файловой базе SQLite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', default='1k')
+        parser.add_argument('--follows', default='10')
+        parser.add_argument('--users', type=int, default=20,
+                            help='Сколько пользователей шлют запросы')
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Потоков в каждом процессе')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Длительность, секунд')
+        parser.add_argument('--mix', default=load.DEFAULT_MIX,
+                            help='Веса операций read/post/comment/follow')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--profiles', nargs='+', default=['tuned'],
+            choices=list(load.PROFILES),
+            help='Профили базы; несколько — прогон каждого и сравнение'
+        )
+        parser.add_argument('--output', help='Записать итог в JSON-файл')
+
+    def handle(self, *args, posts, follows, users, processes, threads,
+               duration, mix, seed, profiles, output, **options):
+        try:
+            mix = load.parse_mix(mix)
+            post_count = benchmark.parse_scale(posts, benchmark.POST_SCALES)
+            follow_count = benchmark.parse_scale(
+                follows, benchmark.FOLLOW_SCALES
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        if processes < 1 or threads < 1:
+            raise CommandError('Нужен хотя бы один процесс и один поток')
+        setup_test_environment(debug=False)
+        try:
+            if connections['default'].vendor != 'sqlite':
+                raise CommandError('Инструмент рассчитан на SQLite')
+            job = (users, mix, duration, processes, threads, seed)
+            results = {}
+            for name in profiles:
+                self.stdout.write(f'Профиль {name}: заполнение...')
+                settings_dict = connections['default'].settings_dict
+                with load.profile(name, settings_dict):
+                    results[name] = self.run(post_count, follow_count, *job)
+                self.report(results[name])
+        finally:
+            teardown_test_environment()
+        if len(results) > 1:
+            self.stdout.write('Запись, в с / "database is locked":')
+            for name, summary in results.items():
+                self.stdout.write(
+                    f'  {name:<6} {load.write_rps(summary):>7} / '
+                    f'{summary["locked"]}'
+                )
+        if output:
+            with open(output, 'w', encoding='utf-8') as target:
+                json.dump(
+                    results if len(results) > 1 else results[profiles[0]],
+                    target, ensure_ascii=False, indent=2
+                )
+
+    def run(self, post_count, follow_count, users, mix, duration,
+            processes, threads, seed):
+        connection = connections['default']
+        # Потоки и процессы должны видеть одну базу — нужен файл, не память.
+        workdir = tempfile.mkdtemp(prefix='yatube-load-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            workdir, 'load.sqlite3'
+        )
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            benchmark.seed(post_count, follow_count)
+            sessions = [
+                load.Session(user)
+                for user in User.objects.order_by('pk')[:users]
+            ]
+            targets = load.Targets()
+            connections.close_all()
+            self.stdout.write(
+                f'Нагрузка: {processes} x {threads} потоков, {duration} с'
+            )
+            job = (sessions, targets, mix, duration, threads)
+            start = time.perf_counter()
+            if processes == 1:
+                parts = [load.run_process(*job, seed)]
+            else:
+                context = multiprocessing.get_context('fork')
+                with context.Pool(processes) as pool:
+                    parts = pool.starmap(load.run_process, [
+                        job + (seed + index * threads,)
+                        for index in range(processes)
+                    ])
+            return load.summarize(parts, time.perf_counter() - start)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict['TEST']['NAME'] = None
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def report(self, summary):
+        self.stdout.write(
+            f'Всего {summary["requests"]} запросов, {summary["rps"]} в с, '
+            f'ошибок {summary["errors"]}, '
+            f'"database is locked": {summary["locked"]}'
+        )
+        wait = summary['lock_wait']
+        self.stdout.write(
+            f'Пишущие операторы: {wait["statements"]}, p50={wait["p50"]} '
+            f'p99={wait["p99"]} max={wait["max"]} мс'
+        )
+        for operation, metrics in summary['operations'].items():
+            self.stdout.write(
+                f'  {operation:<8} {metrics["requests"]:>6} запр. '
+                f'{metrics["rps"]:>7} в с  p50={metrics["p50"]} '
+                f'p95={metrics["p95"]} p99={metrics["p99"]} мс  '
+                f'ошибок {metrics["error_rate"]:.2%}, '
+                f'locked {metrics["locked"]}'
+            )
+            self.stdout.write('    ' + ' '.join(
+                f'{bucket}:{count}'
+                for bucket, count in metrics['histogram'].items()
+            ))
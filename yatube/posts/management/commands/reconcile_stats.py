@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import ProfileStats
+from posts.stats import recount
+
+User = get_user_model()
+
+FIELDS = ('posts_count', 'follows_count', 'followers_count')
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики ProfileStats с данными и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk, fixed, created = 0, 0, 0
+        while True:
+            batch = list(user_ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            with transaction.atomic():
+                stored = ProfileStats.objects.select_for_update().in_bulk(
+                    batch
+                )
+                expected = recount(batch)
+                changed = [
+                    row for user_id, row in expected.items()
+                    if user_id in stored and any(
+                        getattr(row, field) != getattr(stored[user_id], field)
+                        for field in FIELDS
+                    )
+                ]
+                missing = [
+                    row for user_id, row in expected.items()
+                    if user_id not in stored
+                ]
+                ProfileStats.objects.bulk_update(changed, FIELDS)
+                ProfileStats.objects.bulk_create(missing)
+            fixed += len(changed)
+            created += len(missing)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено: {fixed}, создано: {created}'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import markup
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет HTML текста и анонса постов и комментариев; нужен после '
+        'смены правил разметки и для строк, записанных в обход save()'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        for model in (Post, Comment):
+            changed = markup.backfill(model, batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: обновлено {changed}'
+            ))
@@ -0,0 +1,53 @@
+from django.conf import settings as s
+from django.db import transaction
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+
+def render(text):
+    """HTML текста — то же, что даёт фильтр linebreaks в шаблоне."""
+    return linebreaks(text, autoescape=True)
+
+
+def excerpt(text):
+    """HTML анонса для карточки: не длиннее POST_EXCERPT_LENGTH символов."""
+    return render(Truncator(text).chars(s.POST_EXCERPT_LENGTH))
+
+
+# Поле с HTML → функция, собирающая его из text
+RENDERERS = {'text_html': render, 'excerpt_html': excerpt}
+
+
+def fields(model):
+    names = {field.name for field in model._meta.get_fields()}
+    return [name for name in RENDERERS if name in names]
+
+
+def rendered(model, text):
+    """{поле: HTML} для всех HTML-полей модели."""
+    return {name: RENDERERS[name](text) for name in fields(model)}
+
+
+def backfill(model, batch_size=1000):
+    """Перерисовывает HTML-поля пачками по pk; число изменённых строк.
+
+    Принимает и историческую модель из миграции.
+    """
+    names = fields(model)
+    rows = model.objects.order_by('pk').only('pk', 'text', *names)
+    last_pk, changed = 0, 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return changed
+        last_pk = batch[-1].pk
+        stale = []
+        for obj in batch:
+            html = rendered(model, obj.text)
+            if any(getattr(obj, name) != html[name] for name in names):
+                for name in names:
+                    setattr(obj, name, html[name])
+                stale.append(obj)
+        with transaction.atomic():
+            model.objects.bulk_update(stale, names)
+        changed += len(stale)
@@ -0,0 +1,99 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings as s
+from django.core.cache import cache
+
+from . import rows
+from .models import Follow, Post
+
+RECENT_KEY = 'posts:recent:{}'
+FOLLOWING_KEY = 'posts:following:{}'
+
+
+def invalidate_author(author_id):
+    cache.delete(RECENT_KEY.format(author_id))
+
+
+def invalidate_following(*user_ids):
+    cache.delete_many([FOLLOWING_KEY.format(user_id) for user_id in user_ids])
+
+
+def following_ids(user_id):
+    key = FOLLOWING_KEY.format(user_id)
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = list(Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        ).distinct())
+        cache.set(key, author_ids, s.FEED_CACHE_TIMEOUT)
+    return author_ids
+
+
+def load_recent(author_id):
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:s.AUTHOR_RECENT_POSTS]
+    return {
+        'count': Post.objects.filter(author_id=author_id).count(),
+        'recent': [(pub_date.timestamp(), pk) for pk, pub_date in posts],
+    }
+
+
+def recent_posts(author_ids):
+    keys = {RECENT_KEY.format(author_id): author_id
+            for author_id in author_ids}
+    found = cache.get_many(keys)
+    missing = {key: load_recent(author_id)
+               for key, author_id in keys.items() if key not in found}
+    if missing:
+        cache.set_many(missing, s.FEED_CACHE_TIMEOUT)
+    found.update(missing)
+    return list(found.values())
+
+
+class MergedFeed:
+    """Лента подписок как k-way merge кэшированных списков постов авторов.
+
+    Пока не исчерпано окно AUTHOR_RECENT_POSTS ни у одного автора,
+    порядок ленты собирается в памяти; дальше — запрос к базе.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.author_ids = following_ids(user.pk)
+        self.lists = recent_posts(self.author_ids)
+        truncated = [
+            entry['recent'][-1] for entry in self.lists
+            if len(entry['recent']) >= s.AUTHOR_RECENT_POSTS
+        ]
+        self.floor = max(truncated) if truncated else None
+
+    def count(self):
+        return sum(entry['count'] for entry in self.lists)
+
+    def merged_ids(self):
+        for key in heapq.merge(
+            *(entry['recent'] for entry in self.lists), reverse=True
+        ):
+            if self.floor is not None and key < self.floor:
+                return
+            yield key[1]
+
+    def fallback(self, start, stop):
+        posts = Post.objects.select_related('author', 'group').filter(
+            author__following__user=self.user
+        )
+        return rows.for_feed(posts).order_by('-pub_date', '-pk')[start:stop]
+
+    def __getitem__(self, item):
+        start, stop = item.start or 0, item.stop
+        ids = list(islice(self.merged_ids(), stop))
+        if len(ids) < stop and self.floor is not None:
+            return list(self.fallback(start, stop))
+        posts = {
+            post.pk: post for post in rows.for_feed(
+                Post.objects.select_related('author', 'group')
+            ).filter(pk__in=ids[start:stop])
+        }
+        return [posts[pk] for pk in ids[start:stop] if pk in posts]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_profile_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    ProfileStats = apps.get_model('posts', 'ProfileStats')
+    users = User.objects.annotate(
+        posts_total=Count('posts', distinct=True),
+        follows_total=Count('follower', distinct=True),
+        followers_total=Count('following', distinct=True),
+    ).values_list('pk', 'posts_total', 'follows_total', 'followers_total')
+    ProfileStats.objects.bulk_create(
+        (ProfileStats(
+            user_id=pk,
+            posts_count=posts_total,
+            follows_count=follows_total,
+            followers_count=followers_total,
+        ) for pk, posts_total, follows_total, followers_total
+            in users.iterator()),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0010_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('follows_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+            ],
+            options={
+                'verbose_name': 'Статистика профиля',
+                'verbose_name_plural': 'Статистика профилей',
+            },
+        ),
+        migrations.RunPython(fill_profile_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:26
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+BATCH_SIZE = 500
+
+
+def deduplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    ProfileStats = apps.get_model('posts', 'ProfileStats')
+    duplicates = Follow.objects.values('user_id', 'author_id').annotate(
+        total=Count('pk'), keep=Min('pk')
+    ).filter(total__gt=1).order_by('user_id', 'author_id')
+    while True:
+        batch = list(duplicates[:BATCH_SIZE])
+        if not batch:
+            break
+        for row in batch:
+            Follow.objects.filter(
+                user_id=row['user_id'], author_id=row['author_id']
+            ).exclude(pk=row['keep']).delete()
+        user_ids = {row['user_id'] for row in batch}
+        author_ids = {row['author_id'] for row in batch}
+        for stats in ProfileStats.objects.filter(
+            user_id__in=user_ids | author_ids
+        ):
+            stats.follows_count = Follow.objects.filter(
+                user_id=stats.user_id
+            ).count()
+            stats.followers_count = Follow.objects.filter(
+                author_id=stats.user_id
+            ).count()
+            stats.save(update_fields=('follows_count', 'followers_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_follows, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='posts_follow_user_author',
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='posts_follow_unique'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeStamp',
+            fields=[
+                ('scope', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Область')),
+                ('changed', models.BigIntegerField(verbose_name='Изменено, нс')),
+            ],
+            options={
+                'verbose_name': 'Отметка изменения',
+                'verbose_name_plural': 'Отметки изменений',
+            },
+        ),
+    ]
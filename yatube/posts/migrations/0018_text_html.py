@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:39
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+
+BATCH_SIZE = 1000
+
+
+def render_text(apps, schema_editor):
+    # Копия posts.markup.render на момент миграции: правки модуля
+    # не должны менять то, что делает уже выпущенная миграция
+    for name in ('Post', 'Comment'):
+        model = apps.get_model('posts', name)
+        rows = model.objects.order_by('pk').only('pk', 'text')
+        last_pk = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for obj in batch:
+                obj.text_html = linebreaks(obj.text, autoescape=True)
+            model.objects.bulk_update(batch, ['text_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_changestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(default='', editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(default='', editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.RunPython(render_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:40
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+BATCH_SIZE = 1000
+# POST_EXCERPT_LENGTH на момент миграции; настройка может измениться
+EXCERPT_LENGTH = 500
+
+
+def render_excerpts(apps, schema_editor):
+    # Копия posts.markup.excerpt на момент миграции
+    Post = apps.get_model('posts', 'Post')
+    rows = Post.objects.order_by('pk').only('pk', 'text')
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for post in batch:
+            post.excerpt_html = linebreaks(
+                Truncator(post.text).chars(EXCERPT_LENGTH), autoescape=True
+            )
+        Post.objects.bulk_update(batch, ['excerpt_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_text_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(default='', editable=False, verbose_name='HTML анонса'),
+        ),
+        migrations.RunPython(render_excerpts, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from collections import Counter
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
@@ -22,10 +24,18 @@ class Post(models.Model):
         'Текст поста',
         help_text='Текст нового поста'
     )
+    text_html = models.TextField('HTML текста', default='', editable=False)
+    excerpt_html = models.TextField(
+        'HTML анонса', default='', editable=False
+    )
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -46,21 +56,48 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False
+    )
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-pk')
+        indexes = (
+            models.Index(
+                fields=('author', 'pub_date', 'id'),
+                name='posts_post_author_date'
+            ),
+            models.Index(
+                fields=('group', 'pub_date', 'id'),
+                name='posts_post_group_date'
+            ),
+            models.Index(fields=('pub_date', 'id'), name='posts_post_date'),
+        )
 
     def __str__(self):
         return self.text[:15]
 
 
+class CommentQuerySet(models.QuerySet):
+    def delete(self):
+        # Без сигнала post_delete комментарии удаляются вместе с постом
+        # одним DELETE; явное удаление учитывается здесь
+        from . import comments
+
+        post_ids = Counter(self.values_list('post_id', flat=True))
+        deleted = super().delete()
+        comments.removed(post_ids)
+        return deleted
+
+
 class Comment(models.Model):
     text = models.TextField(
         'Текст комментария',
         help_text='Текст нового комментария'
     )
+    text_html = models.TextField('HTML текста', default='', editable=False)
     created = models.DateTimeField(
         'Дата комментария',
         auto_now_add=True
@@ -82,11 +119,38 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
-        ordering = ('-created',)
+        ordering = ('-created', '-pk')
+        indexes = (
+            models.Index(
+                fields=('post', 'created', 'id'),
+                name='posts_comment_post_date'
+            ),
+        )
+
+    objects = CommentQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    def delete(self, *args, **kwargs):
+        from . import comments
+
+        deleted = super().delete(*args, **kwargs)
+        comments.removed(Counter([self.post_id]))
+        return deleted
+
+
+class FollowQuerySet(models.QuerySet):
+    def delete(self):
+        # Сигнал post_delete отключил бы быстрое каскадное удаление,
+        # поэтому явное удаление учитывается здесь
+        from . import follows
+
+        pairs = list(self.values_list('user_id', 'author_id'))
+        deleted = super().delete()
+        follows.removed(pairs)
+        return deleted
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -105,3 +169,77 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписки'
         verbose_name_plural = 'Подписки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='posts_follow_unique'
+            ),
+        )
+
+    objects = FollowQuerySet.as_manager()
+
+    def delete(self, *args, **kwargs):
+        from . import follows
+
+        deleted = super().delete(*args, **kwargs)
+        follows.removed([(self.user_id, self.author_id)])
+        return deleted
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Лента подписок'
+        verbose_name_plural = 'Ленты подписок'
+        ordering = ('-pub_date',)
+        unique_together = ('user', 'post')
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date'),
+                name='posts_timeline_user_date'
+            ),
+        )
+
+
+class ProfileStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    follows_count = models.PositiveIntegerField('Подписок', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика профиля'
+        verbose_name_plural = 'Статистика профилей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class ChangeStamp(models.Model):
+    scope = models.CharField('Область', max_length=64, primary_key=True)
+    changed = models.BigIntegerField('Изменено, нс')
+
+    class Meta:
+        verbose_name = 'Отметка изменения'
+        verbose_name_plural = 'Отметки изменений'
+
+    def __str__(self):
+        return self.scope
@@ -0,0 +1,96 @@
+import time
+
+from django.conf import settings as s
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from . import stamps
+
+VERSION_KEY = 'posts:version:{}'
+COUNT_KEY = 'posts:count:{}:{}'
+
+
+def new_version():
+    return time.time_ns()
+
+
+def get_version(namespace):
+    return versions([namespace])[namespace]
+
+
+def versions(namespaces):
+    """Версии нескольких областей одним get_many.
+
+    Запрос, читающий с реплики, берёт вместо них её отметки изменений:
+    страница из отстающих данных ляжет под старым ключом, а не под
+    новой версией, которую уже выставил primary.
+    """
+    if stamps.read_alias() != DEFAULT_DB_ALIAS:
+        found = stamps.changed(namespaces)
+        return {
+            namespace: f'stamp-{found.get(namespace, 0)}'
+            for namespace in namespaces
+        }
+    keys = {VERSION_KEY.format(name): name for name in namespaces}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, new_version(), None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump(*namespaces, fan_out=True):
+    stamps.touch(*namespaces, fan_out=fan_out)
+    for namespace in namespaces:
+        try:
+            cache.incr(VERSION_KEY.format(namespace))
+        except ValueError:
+            cache.add(VERSION_KEY.format(namespace), new_version(), None)
+
+
+def post_namespaces(author_id, group_id):
+    namespaces = ['index', f'author:{author_id}']
+    if group_id is not None:
+        namespaces.append(f'group:{group_id}')
+    return namespaces
+
+
+def card_namespaces(author_id, group_id):
+    """Области, от которых зависит карточка поста помимо самого поста."""
+    namespaces = [f'card:author:{author_id}']
+    if group_id is not None:
+        namespaces.append(f'card:group:{group_id}')
+    return namespaces
+
+
+def count(namespace, queryset):
+    """(число постов, приблизительно ли) для ленты namespace.
+
+    Точное число живёт до первого изменения ленты. Если постов не меньше
+    PAGINATION_APPROX_COUNT, старое число ещё PAGINATION_APPROX_TIMEOUT
+    секунд отдаётся как приблизительное вместо нового COUNT(*).
+    """
+    version = get_version(namespace)
+    # Свой ключ у каждой базы: версии primary и реплик несравнимы
+    key = COUNT_KEY.format(stamps.read_alias(), namespace)
+    entry = cache.get(key)
+    if entry is not None:
+        total, counted_version, counted_at = entry
+        if counted_version == version:
+            return total, False
+        if (
+            total >= s.PAGINATION_APPROX_COUNT
+            and time.time() - counted_at < s.PAGINATION_APPROX_TIMEOUT
+        ):
+            return total, True
+    total = queryset.count()
+    cache.set(key, (total, version, time.time()), s.FEED_CACHE_TIMEOUT)
+    return total, False
+
+
+def context(namespace):
+    """Ключ фрагмента ленты меняется при каждом изменении её содержимого."""
+    return {
+        'feed_cache_key': f'{namespace}:{get_version(namespace)}',
+        'feed_cache_timeout': s.FEED_PAGE_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,87 @@
+import re
+
+from django.conf import settings as s
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+
+from . import timeline
+from .models import Follow, Group, Post
+from .utils import KeysetPaginator
+
+User = get_user_model()
+
+# SCAN без USING — полный проход таблицы; до SQLite 3.36 строка
+# выглядела как «SCAN TABLE имя»
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def feed_queries():
+    """Запросы лент в том виде, в каком их строят представления."""
+    user = User.objects.order_by('pk').first() or User(pk=0)
+    group = Group.objects.order_by('pk').first() or Group(pk=0)
+    feeds = {
+        'index': Post.objects.select_related('author', 'group'),
+        'group_posts': Post.objects.filter(group=group).select_related(
+            'author'
+        ),
+        'profile': Post.objects.filter(author=user).select_related('group'),
+    }
+    limit = s.COUNT_OBJECTS
+    now = timezone.now()
+    queries = {}
+    for name, posts in feeds.items():
+        ordered = KeysetPaginator(posts, limit).object_list
+        queries[name] = posts[:limit]
+        queries[f'{name}:after'] = KeysetPaginator.after(
+            ordered, now, 1
+        )[:limit + 1]
+        queries[f'{name}:before'] = KeysetPaginator.before(
+            ordered, now, 1
+        )[:limit + 1]
+    queries['follow_index'] = timeline.feed(user).select_related(
+        'author', 'group'
+    )[:limit]
+    queries['author_recent'] = Post.objects.filter(
+        author_id=user.pk
+    ).order_by('-pub_date', '-pk').values_list(
+        'pk', 'pub_date'
+    )[:s.AUTHOR_RECENT_POSTS]
+    post = Post.objects.order_by('pk').first() or Post(pk=0)
+    comments = KeysetPaginator(
+        post.comments.select_related('author'), s.COMMENTS_PER_PAGE,
+        field='created'
+    ).object_list
+    queries['post_comments'] = comments[:s.COMMENTS_PER_PAGE + 1]
+    queries['post_comments:after'] = KeysetPaginator.after(
+        comments, now, 1, 'created'
+    )[:s.COMMENTS_PER_PAGE + 1]
+    queries['following'] = Follow.objects.filter(user=user, author=user)
+    return queries
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def problems(plan):
+    found = []
+    for line in plan:
+        if FULL_SCAN.match(line):
+            found.append(f'полный проход: {line}')
+        elif TEMP_SORT in line:
+            found.append(f'сортировка без индекса: {line}')
+    return found
+
+
+def check():
+    """{имя запроса: (план, проблемы)} по всем лентам."""
+    plans = {
+        name: explain(queryset)
+        for name, queryset in feed_queries().items()
+    }
+    return {name: (plan, problems(plan)) for name, plan in plans.items()}
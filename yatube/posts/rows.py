@@ -0,0 +1,133 @@
+from collections import namedtuple
+
+from django.conf import settings as s
+from django.contrib.auth import get_user_model
+from django.db.models import Model
+from django.db.models.query import ValuesListIterable
+
+from .models import Group, Post
+from .utils import for_cards
+
+User = get_user_model()
+
+COLUMNS = (
+    'pk', 'pub_date', 'updated', 'image', 'excerpt_html', 'comments_count',
+    'author_id', 'author__username', 'author__first_name',
+    'author__last_name', 'group_id', 'group__title', 'group__slug',
+)
+
+
+class Record:
+    """Строка ленты только для чтения; равна экземпляру своей модели."""
+
+    __slots__ = ()
+    model = None
+
+    @property
+    def id(self):
+        return self.pk
+
+    def __eq__(self, other):
+        if isinstance(other, Model):
+            return (
+                other._meta.concrete_model is self.model
+                and other.pk == self.pk
+            )
+        if isinstance(other, Record):
+            return other.model is self.model and other.pk == self.pk
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash((self.model, self.pk))
+
+
+class AuthorRow(Record, namedtuple(
+    'AuthorRow', 'pk username first_name last_name'
+)):
+    __slots__ = ()
+    model = User
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    def __str__(self):
+        return self.username
+
+
+class GroupRow(Record, namedtuple('GroupRow', 'pk title slug')):
+    __slots__ = ()
+    model = Group
+
+    def __str__(self):
+        return self.title
+
+
+class PostRow(Record, namedtuple(
+    'PostRow',
+    'pk pub_date updated image_name excerpt_html comments_count author group'
+)):
+    __slots__ = ()
+    model = Post
+
+    @property
+    def image(self):
+        # Файл картинки с тем же API, что у поля модели: url, name, instance
+        field = Post._meta.get_field('image')
+        return field.attr_class(self, field, self.image_name)
+
+    @property
+    def author_id(self):
+        return self.author.pk
+
+    @property
+    def group_id(self):
+        return self.group.pk if self.group is not None else None
+
+    def __str__(self):
+        return f'Пост {self.pk}'
+
+
+class RowIterable(ValuesListIterable):
+    """Кортежи values_list → PostRow; автор и группа общие на страницу."""
+
+    def __iter__(self):
+        authors, groups = {}, {}
+        for (pk, pub_date, updated, image, excerpt_html, comments_count,
+             author_id, username, first_name, last_name,
+             group_id, title, slug) in super().__iter__():
+            author = authors.get(author_id)
+            if author is None:
+                author = authors[author_id] = AuthorRow(
+                    author_id, username, first_name, last_name
+                )
+            group = None
+            if group_id is not None:
+                group = groups.get(group_id)
+                if group is None:
+                    group = groups[group_id] = GroupRow(group_id, title, slug)
+            yield PostRow(
+                pk, pub_date, updated, image, excerpt_html, comments_count,
+                author, group
+            )
+
+
+def records(posts):
+    """Тот же queryset, но строки — PostRow вместо экземпляров Post.
+
+    Фильтры, сортировка, срезы и count() работают как обычно, поэтому
+    пагинаторы принимают его без изменений.
+    """
+    posts = posts.values_list(*COLUMNS)
+    posts._iterable_class = RowIterable
+    return posts
+
+
+def for_feed(posts):
+    """Посты ленты в виде, заданном FEED_ROWS."""
+    if s.FEED_ROWS == 'records':
+        return records(posts)
+    return for_cards(posts)
@@ -0,0 +1,178 @@
+from collections import Counter
+
+from django.conf import settings as s
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import (
+    comments, follows, markup, merge, page_cache, search, stamps, stats,
+    timeline
+)
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.ensure(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def text_rendered(sender, instance, raw=False, **kwargs):
+    if not raw:
+        for name, html in markup.rendered(sender, instance.text).items():
+            setattr(instance, name, html)
+
+
+@receiver(pre_save, sender=Post)
+def post_regrouped(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    old_group_id = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', flat=True
+    ).first()
+    if old_group_id is not None and old_group_id != instance.group_id:
+        page_cache.bump(f'group:{old_group_id}')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        page_cache.bump(*page_cache.post_namespaces(
+            instance.author_id, instance.group_id
+        ))
+
+
+@receiver(post_save, sender=Comment)
+def comment_counted(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    stamps.touch(f'post:{instance.post_id}', fan_out=False)
+    if created:
+        stats.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        # Карточки в лентах комментарии не показывают: ленты подписчиков
+        # автора не меняются, и рассылать им отметки незачем
+        page_cache.bump(*page_cache.post_namespaces(*post), fan_out=False)
+
+
+# Поля, выводимые в карточках постов
+CARD_FIELDS = {
+    User: ('username', 'first_name', 'last_name'),
+    Group: ('title', 'slug'),
+}
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Group)
+def card_fields_changing(sender, instance, raw=False, update_fields=None,
+                         **kwargs):
+    """Запоминает, изменятся ли поля из карточек постов.
+
+    Сохранение без update_fields (смена пароля, правка в админке) не
+    сбрасывает карточки, если имя или название остались прежними.
+    """
+    fields = CARD_FIELDS[sender]
+    instance._card_fields_changed = False
+    if raw or instance.pk is None or (
+        update_fields is not None and not set(fields) & set(update_fields)
+    ):
+        return
+    old = sender._default_manager.filter(pk=instance.pk).values_list(
+        *fields
+    ).first()
+    instance._card_fields_changed = old is not None and old != tuple(
+        getattr(instance, name) for name in fields
+    )
+
+
+def cards_changed(namespace, posts):
+    """Сбрасывает карточки области и ленты с ними, не трогая посты."""
+    feeds = set()
+    for author_id, group_id in posts.values_list(
+        'author_id', 'group_id'
+    ).distinct():
+        feeds.update(page_cache.post_namespaces(author_id, group_id))
+    page_cache.bump(f'card:{namespace}', namespace, *feeds)
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, raw=False, **kwargs):
+    if getattr(instance, '_card_fields_changed', False):
+        cards_changed(f'group:{instance.pk}', instance.posts.all())
+
+
+@receiver(pre_delete, sender=Group)
+def group_removed(sender, instance, **kwargs):
+    # Посты останутся без группы: ключ их карточек сменится сам
+    cards_changed(f'group:{instance.pk}', instance.posts.all())
+
+
+@receiver(post_save, sender=User)
+def author_renamed(sender, instance, created, raw=False, **kwargs):
+    if getattr(instance, '_card_fields_changed', False):
+        cards_changed(f'author:{instance.pk}', instance.posts.all())
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    stats.bump(instance.author_id, posts_count=1)
+    merge.invalidate_author(instance.author_id)
+    if s.FOLLOW_FEED == 'timeline':
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_removed(sender, instance, **kwargs):
+    stats.bump(instance.author_id, create=False, posts_count=-1)
+    merge.invalidate_author(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        follows.followed(instance.user_id, instance.author_id)
+
+
+@receiver(pre_delete, sender=User)
+def user_removing(sender, instance, **kwargs):
+    instance._follows_removed = follows.user_removing(instance.pk)
+    # Комментарии к чужим постам уйдут каскадом без сигналов
+    instance._comments_removed = Counter(Comment.objects.filter(
+        author=instance
+    ).exclude(post__author=instance).values_list('post_id', flat=True))
+
+
+@receiver(post_delete, sender=User)
+def user_removed(sender, instance, **kwargs):
+    follows.user_removed(*instance._follows_removed)
+    comments.removed(instance._comments_removed)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
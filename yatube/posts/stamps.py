@@ -0,0 +1,138 @@
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, router
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import ChangeStamp, Follow, Group, Post
+
+User = get_user_model()
+
+# Подзапросы, превращающие значение из URL в имя области
+LOOKUPS = {
+    'group': "SELECT 'group:' || id FROM {group} WHERE slug = %s",
+    'author': "SELECT 'author:' || id FROM {user} WHERE username = %s",
+    'post_author': "SELECT 'author:' || author_id FROM {post} WHERE id = %s",
+}
+
+
+def tables():
+    qn = connection.ops.quote_name
+    return {
+        'stamp': qn(ChangeStamp._meta.db_table),
+        'follow': qn(Follow._meta.db_table),
+        'group': qn(Group._meta.db_table),
+        'post': qn(Post._meta.db_table),
+        'user': qn(User._meta.db_table),
+    }
+
+
+def read_alias():
+    """База, откуда текущий запрос читает ленты, а с ними и отметки.
+
+    Отметки реплицируются вместе с данными: с отстающей реплики придут
+    отметки, соответствующие её же данным.
+    """
+    return router.db_for_read(ChangeStamp)
+
+
+def touch(*scopes, fan_out=True):
+    """Отмечает изменение областей одним upsert.
+
+    Изменение автора меняет и ленты подписок его подписчиков
+    (fan_out) — иначе проверка ленты стоила бы соединения с Follow.
+    """
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+    now = time.time_ns()
+    names = tables()
+    upsert = (
+        'ON CONFLICT (scope) DO UPDATE SET changed = excluded.changed'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {names["stamp"]} (scope, changed) VALUES '
+            + ', '.join(['(%s, %s)'] * len(scopes)) + f' {upsert}',
+            [value for scope in scopes for value in (scope, now)]
+        )
+        authors = [
+            int(scope.split(':')[1]) for scope in scopes
+            if scope.startswith('author:')
+        ]
+        if fan_out and authors:
+            cursor.execute(
+                f'INSERT INTO {names["stamp"]} (scope, changed) '
+                f"SELECT DISTINCT 'follow:' || user_id, %s "
+                f'FROM {names["follow"]} WHERE author_id IN '
+                f'({", ".join(["%s"] * len(authors))}) {upsert}',
+                [now, *authors]
+            )
+
+
+def reset():
+    """Сдвигает все отметки — после изменений в обход сигналов."""
+    ChangeStamp.objects.update(changed=time.time_ns())
+
+
+def latest(scopes=(), lookups=()):
+    """Последнее изменение среди областей одним запросом по ключу.
+
+    lookups — пары (имя из LOOKUPS, значение из URL).
+    """
+    names = tables()
+    parts = ['%s'] * len(scopes) + [
+        '(' + LOOKUPS[name].format(**names) + ')' for name, _ in lookups
+    ]
+    with connections[read_alias()].cursor() as cursor:
+        cursor.execute(
+            f'SELECT MAX(changed) FROM {names["stamp"]} '
+            f'WHERE scope IN ({", ".join(parts)})',
+            [*scopes, *(value for _, value in lookups)]
+        )
+        return cursor.fetchone()[0]
+
+
+def changed(scopes):
+    """{область: отметка} одним запросом с базы текущего запроса."""
+    scopes = list(scopes)
+    if not scopes:
+        return {}
+    with connections[read_alias()].cursor() as cursor:
+        cursor.execute(
+            f'SELECT scope, changed FROM {tables()["stamp"]} '
+            f'WHERE scope IN ({", ".join(["%s"] * len(scopes))})', scopes
+        )
+        return dict(cursor.fetchall())
+
+
+def conditional(scopes):
+    """ETag/Last-Modified по отметкам областей; 304 без вызова представления.
+
+    scopes(request, *args, **kwargs) возвращает аргументы для latest.
+    ETag зависит и от пользователя: в шапке страниц его имя. Last-Modified
+    не различает пользователей, поэтому отдаётся только анонимным.
+    """
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            changed = latest(**scopes(request, *args, **kwargs))
+            if changed is None:
+                return view(request, *args, **kwargs)
+            etag = f'"{changed:x}-{request.user.pk or 0}"'
+            modified = None
+            if not request.user.is_authenticated:
+                modified = datetime.fromtimestamp(
+                    changed / 1e9, timezone.utc
+                )
+            response = condition(
+                etag_func=lambda *args, **kwargs: etag,
+                last_modified_func=lambda *args, **kwargs: modified,
+            )(view)(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return inner
+    return decorator
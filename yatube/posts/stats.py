@@ -0,0 +1,74 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, ProfileStats
+
+
+def count_by(queryset, field, user_ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': user_ids}).values_list(
+            field
+        ).annotate(total=Count('pk')).order_by()
+    )
+
+
+def recount(user_ids):
+    """Точные значения счётчиков для пачки пользователей."""
+    posts = count_by(Post.objects, 'author_id', user_ids)
+    follows = count_by(Follow.objects, 'user_id', user_ids)
+    followers = count_by(Follow.objects, 'author_id', user_ids)
+    return {
+        user_id: ProfileStats(
+            user_id=user_id,
+            posts_count=posts.get(user_id, 0),
+            follows_count=follows.get(user_id, 0),
+            followers_count=followers.get(user_id, 0),
+        )
+        for user_id in user_ids
+    }
+
+
+def ensure(user_id):
+    try:
+        with transaction.atomic():
+            ProfileStats.objects.bulk_create(recount([user_id]).values())
+    except IntegrityError:
+        pass
+
+
+def bump(user_id, create=True, **deltas):
+    rows = ProfileStats.objects.filter(user_id=user_id, **{
+        f'{field}__gte': -delta
+        for field, delta in deltas.items() if delta < 0
+    })
+    updated = rows.update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated and create:
+        ensure(user_id)
+
+
+def bump_many(user_ids, **deltas):
+    """bump для многих пользователей одним UPDATE; строки не создаёт."""
+    if not user_ids:
+        return
+    ProfileStats.objects.filter(user_id__in=user_ids, **{
+        f'{field}__gte': -delta
+        for field, delta in deltas.items() if delta < 0
+    }).update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def recount_comments(posts):
+    """Пересчитывает Post.comments_count для выборки постов."""
+    totals = Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post'
+    ).annotate(total=Count('pk')).values('total')
+    return posts.update(comments_count=Coalesce(Subquery(totals), 0))
+
+
+def bump_comments(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
@@ -0,0 +1,12 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page):
+    """Номера страниц для ссылок: окно, если пагинатор его умеет."""
+    window = getattr(page.paginator, 'window', None)
+    if window is None:
+        return page.paginator.page_range
+    return window(page.number)
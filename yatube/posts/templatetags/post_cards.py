@@ -0,0 +1,52 @@
+from django import template
+from django.conf import settings as s
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .. import page_cache, thumbnails
+
+register = template.Library()
+
+CARD_KEY = 'posts:card:{}:{}:{}:{}'
+
+
+def card_key(post, variant, versions=None):
+    """Ключ карточки: правка поста, переименование автора или группы."""
+    namespaces = page_cache.card_namespaces(post.author_id, post.group_id)
+    if versions is None:
+        versions = page_cache.versions(namespaces)
+    return CARD_KEY.format(
+        variant, post.pk, post.updated.timestamp(),
+        '-'.join(str(versions[namespace]) for namespace in namespaces)
+    )
+
+
+@register.simple_tag
+def post_cards(posts, group_flag=False, profile_flag=False):
+    """Карточки страницы одним get_many; рендерятся только промахи."""
+    variant = 'group' if group_flag else 'profile' if profile_flag else 'feed'
+    posts = list(posts)
+    versions = page_cache.versions({
+        namespace for post in posts
+        for namespace in page_cache.card_namespaces(
+            post.author_id, post.group_id
+        )
+    })
+    keys = [card_key(post, variant, versions) for post in posts]
+    cards = cache.get_many(keys)
+    thumbnails.prefetch(
+        post.image for key, post in zip(keys, posts) if key not in cards
+    )
+    missing = {
+        key: render_to_string('posts/includes/post_card.html', {
+            'post': post,
+            'group_flag': group_flag,
+            'profile_flag': profile_flag,
+        })
+        for key, post in zip(keys, posts) if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, s.CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,17 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image):
+    """Миниатюра, если она уже построена, иначе исходная картинка."""
+    if not image:
+        return None
+    thumbnail = thumbnails.lookup(image)
+    if thumbnail is None:
+        thumbnails.schedule(image.instance)
+        return image
+    return thumbnail
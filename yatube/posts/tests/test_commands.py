@@ -0,0 +1,307 @@
+import json
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import benchmark, export, load, query_plans
+from ..models import Comment, Follow, Group, Post, ProfileStats, User
+from ..search import search
+
+
+class ImportCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def run_import(self, content, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as source:
+            source.write(content)
+            source.flush()
+            call_command(
+                'import_yatube', source.name, *args,
+                batch_size=2, stdout=StringIO()
+            )
+
+    def test_import_ndjson(self):
+        """NDJSON-импорт создаёт записи и пересобирает производные данные."""
+        records = [
+            {'type': 'post', 'id': 100, 'author': 'author',
+             'group': 'test-slug', 'text': 'Импортированный пост',
+             'pub_date': '2020-01-02T03:04:05+00:00'},
+            {'type': 'post', 'author': 'author', 'text': 'Второй пост'},
+            {'type': 'post', 'author': 'nobody', 'text': 'Пропуск'},
+            {'type': 'comment', 'author': 'reader', 'post': 100,
+             'text': 'Комментарий'},
+            {'type': 'follow', 'user': 'reader', 'author': 'author'},
+            {'type': 'follow', 'user': 'reader', 'author': 'reader'},
+        ]
+        self.run_import('\n'.join(map(json.dumps, records)))
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertTrue(Comment.objects.filter(post=post))
+        self.assertEqual(Follow.objects.count(), 1)
+        stats = ProfileStats.objects.get(user=self.author)
+        self.assertEqual(stats.posts_count, 2)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(self.reader.timeline.count(), 2)
+        self.assertEqual(
+            list(search(Post.objects.all(), 'импортированный')), [post]
+        )
+
+    def test_import_skips_unknown_posts(self):
+        """Комментарий к неизвестному посту и повтор id пропускаются."""
+        existing = Post.objects.create(author=self.author, text='Уже был')
+        records = [
+            {'type': 'comment', 'author': 'reader', 'post': existing.pk + 50,
+             'text': 'Висячий комментарий'},
+            {'type': 'comment', 'author': 'reader', 'post': existing.pk,
+             'text': 'К старому посту'},
+            {'type': 'post', 'id': existing.pk, 'author': 'author',
+             'text': 'Повтор id'},
+        ]
+        self.run_import('\n'.join(map(json.dumps, records)))
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['К старому посту']
+        )
+        self.assertEqual(Post.objects.get(pk=existing.pk).text, 'Уже был')
+
+    def test_import_auto_ids_do_not_collide(self):
+        """Посты без id не занимают явные id из дальнейших строк."""
+        last = Post.objects.create(author=self.author, text='Последний').pk
+        records = [
+            {'type': 'post', 'author': 'author', 'text': 'Без id'},
+            {'type': 'post', 'id': last + 1, 'author': 'author',
+             'text': 'Явный id'},
+            {'type': 'comment', 'author': 'reader', 'post': last + 1,
+             'text': 'К явному id'},
+        ]
+        self.run_import('\n'.join(map(json.dumps, records)))
+        self.assertEqual(Post.objects.get(pk=last + 1).text, 'Явный id')
+        self.assertTrue(Post.objects.filter(text='Без id'))
+        self.assertTrue(Comment.objects.filter(post_id=last + 1))
+
+    def test_import_taken_id_in_later_batch_is_skipped(self):
+        """Явный id, уже занятый прошлой пачкой, пропускается без ошибки."""
+        last = Post.objects.create(author=self.author, text='Последний').pk
+        records = [
+            {'type': 'post', 'author': 'author', 'text': 'Первый'},
+            {'type': 'post', 'author': 'author', 'text': 'Второй'},
+            {'type': 'post', 'id': last + 1, 'author': 'author',
+             'text': 'Поздний'},
+        ]
+        self.run_import('\n'.join(map(json.dumps, records)))
+        self.assertEqual(Post.objects.get(pk=last + 1).text, 'Первый')
+        self.assertFalse(Post.objects.filter(text='Поздний'))
+
+    def test_import_csv(self):
+        """CSV-импорт подписок."""
+        self.run_import(
+            'user,author\nreader,author\n', '--format', 'csv',
+            '--kind', 'follow'
+        )
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+        )
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.moderator = User.objects.create_user(
+            username='moderator', is_staff=True
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Пост для выгрузки',
+        )
+        Comment.objects.create(
+            author=cls.stranger,
+            post=cls.post,
+            text='Комментарий для выгрузки',
+        )
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_profile_export_streams_ndjson(self):
+        """Автор получает потоковую NDJSON-выгрузку своих постов."""
+        response = self.author_client.get(
+            reverse('posts:profile_export', args=(self.author.username,))
+        )
+        self.assertTrue(response.streaming)
+        rows = [
+            json.loads(line) for line in
+            b''.join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual([row['type'] for row in rows], ['post', 'comment'])
+        self.assertEqual(rows[0]['group'], self.group.slug)
+        self.assertEqual(rows[1]['post'], self.post.pk)
+
+    def test_export_permissions(self):
+        """Чужие данные выгружает только модератор."""
+        stranger = Client()
+        stranger.force_login(self.stranger)
+        moderator = Client()
+        moderator.force_login(self.moderator)
+        urls = (
+            (reverse('posts:profile_export', args=(self.author.username,)),
+             stranger, HTTPStatus.FORBIDDEN),
+            (reverse('posts:group_export', args=(self.group.slug,)),
+             self.author_client, HTTPStatus.FORBIDDEN),
+            (reverse('posts:group_export', args=(self.group.slug,))
+             + '?format=csv', moderator, HTTPStatus.OK),
+        )
+        for url, client, status in urls:
+            with self.subTest(url=url):
+                self.assertEqual(client.get(url).status_code, status)
+
+    def test_csv_starts_with_header(self):
+        """CSV-выгрузка начинается со строки заголовка."""
+        self.assertEqual(
+            next(export.as_csv([])), ','.join(export.FIELDS) + '\r\n'
+        )
+
+    def test_export_round_trip(self):
+        """Выгрузка командой читается командой import_yatube."""
+        with tempfile.NamedTemporaryFile(suffix='.csv') as dump:
+            call_command(
+                'export_yatube', '--author', 'author', '--format', 'csv',
+                '--output', dump.name
+            )
+            Post.objects.all().delete()
+            call_command(
+                'import_yatube', dump.name, '--format', 'csv',
+                stdout=StringIO()
+            )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, self.post.text)
+        self.assertEqual(post.comments.count(), 1)
+
+
+class BenchmarkTests(TestCase):
+    def test_seed_and_run(self):
+        """Набор заполняется, все страницы замеряются."""
+        reader = benchmark.seed(posts=30, follows=3)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(reader.stats.follows_count, 3)
+        self.assertTrue(reader.timeline.exists())
+        results = benchmark.run(reader, repeat=2)
+        self.assertEqual(set(results), set(benchmark.VIEWS))
+        for metrics in results.values():
+            self.assertLessEqual(metrics['p50'], metrics['p99'])
+            self.assertGreater(metrics['queries'], 0)
+        pages = benchmark.materialize(reader, repeat=2)
+        for modes in pages.values():
+            self.assertEqual(set(modes), set(benchmark.ROW_MODES))
+            self.assertEqual(
+                modes['models']['rows'], modes['records']['rows']
+            )
+
+    def test_compare(self):
+        """Регрессия — рост задержки сверх допуска или лишний запрос."""
+        baseline = {'1k/10': {'posts:home_page': {
+            'p50': 10.0, 'p95': 20.0, 'p99': 30.0,
+            'queries': 4, 'peak_kb': 300.0,
+        }}}
+        current = {'1k/10': {'posts:home_page': {
+            'p50': 10.5, 'p95': 30.0, 'p99': 30.0,
+            'queries': 5, 'peak_kb': 310.0,
+        }}}
+        regressions = benchmark.compare(baseline, current, threshold=0.2)
+        self.assertEqual(
+            [item['metric'] for item in regressions], ['p95', 'queries']
+        )
+
+
+class LoadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from yatube.wsgi import application
+        cls.app = application
+        cls.user = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def test_parse_mix(self):
+        """Смесь разбирается, неизвестная операция — ошибка."""
+        self.assertEqual(
+            load.parse_mix('read=8,post=2'), {'read': 8, 'post': 2}
+        )
+        with self.assertRaises(ValueError):
+            load.parse_mix('read=8,delete=2')
+
+    def test_session_writes_through_wsgi(self):
+        """Сессия с CSRF позволяет писать через WSGI-приложение."""
+        session = load.Session(self.user)
+        status = load.call(
+            self.app, session, 'POST', reverse('posts:add_comment',
+                                               args=[self.post.pk]),
+            {'text': 'Комментарий'}
+        )
+        self.assertEqual(status, HTTPStatus.FOUND)
+        self.assertTrue(Comment.objects.filter(
+            post=self.post, author=self.user
+        ).exists())
+
+    def test_summarize(self):
+        """Итог считает частоты, ошибки и корзины гистограммы."""
+        summary = load.summarize([{
+            'latencies': {'read': [1.0, 3.0, 30.0, 6000.0]},
+            'errors': {'read': 1},
+            'locked': {'read': 1},
+            'lock_waits': [2.0],
+        }], elapsed=2)
+        read = summary['operations']['read']
+        self.assertEqual(summary['rps'], 2)
+        self.assertEqual(read['error_rate'], 0.25)
+        self.assertEqual(
+            read['histogram'], {'<=1': 1, '<=5': 1, '<=50': 1, '>5000': 1}
+        )
+
+
+class QueryPlanTests(TestCase):
+    def test_feed_plans_use_indexes(self):
+        """Запросы лент идут по индексам, без сортировки в памяти."""
+        benchmark.seed(posts=50, follows=3)
+        call_command('check_query_plans', stdout=StringIO())
+
+    def test_problems(self):
+        """Полный проход и временное B-дерево считаются проблемой."""
+        self.assertEqual(len(query_plans.problems([
+            'SCAN posts_post',
+            'SCAN posts_post USING INDEX posts_post_date',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ])), 2)
+
+    def test_problems_old_format(self):
+        """Формат планов SQLite до 3.36 распознаётся так же."""
+        self.assertEqual(len(query_plans.problems([
+            'SCAN TABLE posts_post',
+            'SCAN TABLE posts_post AS U0',
+            'SCAN TABLE posts_post USING INDEX posts_post_date',
+            'SEARCH TABLE posts_follow USING INDEX follow_user (user_id=?)',
+        ])), 2)
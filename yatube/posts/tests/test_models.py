@@ -1,6 +1,11 @@
-from django.test import TestCase
+from io import StringIO
 
-from ..models import Comment, Group, Post, User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Comment, Follow, Group, Post, ProfileStats, User
 
 
 class PostsModelTests(TestCase):
@@ -66,3 +71,98 @@ class PostsModelTests(TestCase):
                     post._meta.get_field(field).help_text,
                     expected_value
                 )
+
+
+class ProfileStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def get_stats(self, user):
+        return ProfileStats.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счётчики обновляются при создании и удалении постов и подписок."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+        self.assertEqual(self.get_stats(self.author).followers_count, 1)
+        self.assertEqual(self.get_stats(self.reader).follows_count, 1)
+        post.delete()
+        follow.delete()
+        stats = self.get_stats(self.author)
+        self.assertEqual(stats.posts_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+        self.assertEqual(self.get_stats(self.reader).follows_count, 0)
+
+    def test_user_delete_does_not_scale_with_followers(self):
+        """Удаление пользователя — одинаковое число запросов при любом
+        числе подписчиков; их счётчики уменьшаются."""
+        counts = []
+        for followers in (2, 6):
+            author = User.objects.create_user(username=f'gone{followers}')
+            Post.objects.create(author=author, text='Пост')
+            readers = [
+                User.objects.create_user(username=f'r{followers}-{number}')
+                for number in range(followers)
+            ]
+            for reader in readers:
+                Follow.objects.create(user=reader, author=author)
+            Follow.objects.create(user=author, author=self.author)
+            with CaptureQueriesContext(connection) as queries:
+                author.delete()
+            counts.append(len(queries))
+            for reader in readers:
+                self.assertEqual(self.get_stats(reader).follows_count, 0)
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.get_stats(self.author).followers_count, 0)
+
+    def test_reconcile_stats_command(self):
+        """Команда reconcile_stats исправляет расхождения счётчиков."""
+        Post.objects.create(author=self.author, text='Пост')
+        ProfileStats.objects.filter(user=self.author).update(posts_count=7)
+        ProfileStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_stats', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+        self.assertTrue(ProfileStats.objects.filter(user=self.reader))
+
+
+class TextHtmlTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def test_rendered_on_save(self):
+        """HTML текста собирается при сохранении и экранирует разметку."""
+        post = Post.objects.create(
+            author=self.author, text='<b>раз</b>\n\nдва'
+        )
+        self.assertEqual(
+            post.text_html, '<p>&lt;b&gt;раз&lt;/b&gt;</p>\n\n<p>два</p>'
+        )
+        comment = Comment.objects.create(
+            author=self.author, post=post, text='строка\nещё'
+        )
+        self.assertEqual(comment.text_html, '<p>строка<br>ещё</p>')
+        post.text = 'новый'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, '<p>новый</p>')
+
+    def test_render_text_command(self):
+        """render_text заполняет HTML строк, записанных в обход save()."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.filter(pk=post.pk).update(text='Правка', text_html='')
+        call_command('render_text', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, '<p>Правка</p>')
+        self.assertEqual(post.excerpt_html, '<p>Правка</p>')
+
+    @override_settings(POST_EXCERPT_LENGTH=10)
+    def test_excerpt_is_bounded(self):
+        """Анонс длинного поста обрезан до POST_EXCERPT_LENGTH символов."""
+        post = Post.objects.create(author=self.author, text='слово ' * 100)
+        self.assertEqual(post.excerpt_html, '<p>слово сло…</p>')
@@ -1,8 +1,13 @@
 from django.conf import settings as s
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import connection
+from django.test import Client, override_settings, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..models import Group, Post, User
+from ..utils import KeysetPaginator, WindowedPaginator
 
 
 class PaginatorViewsTest(TestCase):
@@ -24,6 +29,8 @@ class PaginatorViewsTest(TestCase):
             text=f'Тестовый пост {post_number}',
             group=cls.group) for post_number in range(cls.COUNT_TEST_POSTS))
         Post.objects.bulk_create(cls.posts)
+        # bulk_create минует сигналы — как и импорт, сбрасываем кэш лент
+        cache.clear()
 
     def setUp(self) -> None:
         self.authorized_client = Client()
@@ -59,3 +66,114 @@ class PaginatorViewsTest(TestCase):
                             f'Некорректное количество постов'
                             f'на странице: {number_page}'
                         )
+
+    @override_settings(PAGINATION_MODE='cursor')
+    def test_cursor_pagination(self):
+        """Курсорная пагинация обходит ленту без COUNT и повторов."""
+        url = reverse('posts:group_posts', args=(self.group.slug,))
+        response = self.client.get(url)
+        first_page = response.context['page_obj']
+        self.assertIsInstance(first_page.paginator, KeysetPaginator)
+        self.assertEqual(len(first_page), s.COUNT_OBJECTS)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                f'{url}?after={first_page.next_cursor}'
+            )
+        second_page = response.context['page_obj']
+        self.assertEqual(
+            len(second_page), self.COUNT_TEST_POSTS - s.COUNT_OBJECTS
+        )
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        seen = {post.pk for post in first_page} | {
+            post.pk for post in second_page
+        }
+        self.assertEqual(len(seen), self.COUNT_TEST_POSTS)
+        response = self.client.get(
+            f'{url}?before={second_page.previous_cursor}'
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in first_page]
+        )
+
+    @override_settings(PAGINATION_MODE='cursor')
+    def test_cursor_pagination_bad_token(self):
+        """Некорректный курсор открывает первую страницу."""
+        response = self.client.get(reverse('posts:home_page') + '?after=@@')
+        self.assertEqual(len(response.context['page_obj']), s.COUNT_OBJECTS)
+
+
+@override_settings(COUNT_OBJECTS=1, PAGINATION_WINDOW=1)
+class WindowedPaginatorTests(TestCase):
+    COUNT_TEST_POSTS = 9
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        for number in range(cls.COUNT_TEST_POSTS):
+            Post.objects.create(author=cls.user, text=f'Пост {number}')
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            query for query in queries if 'COUNT(' in query['sql']
+        ]
+
+    def test_window(self):
+        """Ссылки только на соседние страницы, первую и последнюю."""
+        response = self.client.get(reverse('posts:home_page') + '?page=5')
+        page = response.context['page_obj']
+        self.assertIs(type(page), Page)
+        self.assertIsInstance(page.paginator, WindowedPaginator)
+        self.assertEqual(list(page.paginator.window(page.number)), [4, 5, 6])
+        for number in (1, 4, 6, 9):
+            self.assertContains(response, f'page={number}"')
+        for number in (2, 3, 7, 8):
+            self.assertNotContains(response, f'page={number}"')
+
+    def test_count_is_cached_until_feed_changes(self):
+        """COUNT(*) повторяется только после нового или удалённого поста."""
+        url = reverse('posts:profile', args=(self.user.username,))
+        _, counts = self.count_queries(url)
+        self.assertEqual(len(counts), 1)
+        _, counts = self.count_queries(url)
+        self.assertFalse(counts)
+        post = Post.objects.create(author=self.user, text='Ещё')
+        response, counts = self.count_queries(url)
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            self.COUNT_TEST_POSTS + 1
+        )
+        post.delete()
+        response, counts = self.count_queries(url)
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            self.COUNT_TEST_POSTS
+        )
+
+    @override_settings(PAGINATION_APPROX_COUNT=5)
+    def test_approximate_count(self):
+        """Выше порога старое число отдаётся как приблизительное."""
+        url = reverse('posts:home_page')
+        self.client.get(url)
+        Post.objects.create(author=self.user, text='Ещё')
+        response, counts = self.count_queries(url)
+        paginator = response.context['page_obj'].paginator
+        self.assertFalse(counts)
+        self.assertTrue(paginator.approximate)
+        self.assertEqual(paginator.count, self.COUNT_TEST_POSTS)
+        with override_settings(PAGINATION_APPROX_TIMEOUT=0):
+            response, counts = self.count_queries(url)
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            self.COUNT_TEST_POSTS + 1
+        )
@@ -1,16 +1,26 @@
+import os
 import shutil
+import sqlite3
 import tempfile
+from contextlib import closing
 
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, override_settings, TestCase
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import (
+    Client, override_settings, TestCase, TransactionTestCase
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from .. import page_cache, query_plans, rows, stamps, stats, thumbnails
 from ..forms import PostForm
-from ..models import Comment, Follow, Group, Post, User
+from ..models import Comment, Follow, Group, Post, Timeline, User
+from ..templatetags.post_cards import card_key
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -65,10 +75,11 @@ class PostsPageTests(TestCase):
     def helper_function_check_context(self, response, flag=False):
         if flag:
             post = response.context['post']
+            self.assertEqual(post.text, self.post.text)
         else:
             post = response.context['page_obj'][self.ZERO]
+            self.assertEqual(post.excerpt_html, self.post.excerpt_html)
         self.assertEqual(post.author, self.post.author)
-        self.assertEqual(post.text, self.post.text)
         self.assertEqual(post.group, self.post.group)
         self.assertEqual(post.pub_date, self.post.pub_date)
         self.assertEqual(post.image, self.post.image)
@@ -102,6 +113,23 @@ class PostsPageTests(TestCase):
         self.helper_function_check_context(response)
         self.assertEqual(response.context['author'], self.user)
 
+    def test_profile_counters_without_aggregates(self):
+        """Счётчики профиля и поста выводятся без COUNT-запросов."""
+        urls = (
+            (reverse('posts:profile', args=(self.user.username,)), 1),
+            (reverse('posts:post_detail', args=(self.post.pk,)), 0),
+        )
+        for url, paginator_counts in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                counts = [
+                    query for query in queries
+                    if query['sql'].startswith('SELECT COUNT(')
+                ]
+                self.assertEqual(len(counts), paginator_counts)
+                self.assertContains(response, 'Всего постов')
+
     def test_create_page_show_correct_context(self):
         """Формирование шаблонов create и edit с правильным контекстом."""
         urls_name = (
@@ -142,8 +170,10 @@ class PostsPageTests(TestCase):
         self.assertTrue(post.group)
 
     def test_cache_index(self):
-        """Список постов хранится в кэше заданное время"""
+        """Список постов берётся из кэша, пока лента не изменилась."""
+        cache.clear()
         Post.objects.all().delete()
+        self.uploaded.seek(0)
         form_data = {
             'text': 'Новый пост',
             'group': self.group.pk,
@@ -155,12 +185,118 @@ class PostsPageTests(TestCase):
             follow=True
         )
         first_request = self.authorized_client.get(reverse('posts:home_page'))
-        Post.objects.all().delete()
+        Post.objects.update(text='Изменён в обход сигналов')
         second_request = self.authorized_client.get(reverse('posts:home_page'))
         self.assertEqual(first_request.content, second_request.content)
-        cache.clear()
+        Post.objects.all().delete()
         third_request = self.authorized_client.get(reverse('posts:home_page'))
         self.assertNotEqual(first_request.content, third_request.content)
+        self.assertNotContains(third_request, form_data['text'])
+
+    def test_cache_invalidated_by_comment_and_group(self):
+        """Версии кэша лент меняются при изменении постов, комментариев
+        и групп."""
+        namespaces = (
+            'index',
+            f'group:{self.group.pk}',
+            f'author:{self.user.pk}',
+        )
+        versions = [page_cache.get_version(name) for name in namespaces]
+        comment = Comment.objects.create(
+            author=self.user,
+            text='Ещё комментарий',
+            post=self.post,
+        )
+        for name, version in zip(namespaces, versions):
+            with self.subTest(name=name):
+                self.assertNotEqual(page_cache.get_version(name), version)
+        for delete in (comment.delete, Comment.objects.filter(
+            pk=self.comment.pk
+        ).delete):
+            versions = [page_cache.get_version(name) for name in namespaces]
+            delete()
+            for name, version in zip(namespaces, versions):
+                with self.subTest(name=name, delete=delete):
+                    self.assertNotEqual(
+                        page_cache.get_version(name), version
+                    )
+        group_version = page_cache.get_version(f'group:{self.group.pk}')
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertNotEqual(
+            page_cache.get_version(f'group:{self.group.pk}'), group_version
+        )
+
+    def test_post_cards_cached(self):
+        """Карточка поста рендерится один раз и сбрасывается при правке."""
+        cache.clear()
+        url = reverse('posts:home_page')
+        self.client.get(url)
+        key = card_key(self.post, 'feed')
+        self.assertIn(key, cache)
+        cache.set(key, 'Карточка из кэша')
+        page_cache.bump('index')
+        self.assertContains(self.client.get(url), 'Карточка из кэша')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Карточка из кэша')
+        self.assertContains(response, 'Исправленный текст')
+
+    def test_post_cards_follow_author_and_group(self):
+        """Карточки сбрасываются при смене имени автора или названия
+        группы; сами посты при этом не перезаписываются."""
+        updated = Post.objects.get(pk=self.post.pk).updated
+        key = card_key(self.post, 'feed')
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertEqual(card_key(self.post, 'feed'), key)
+        for instance, field in ((self.user, 'first_name'),
+                                (self.group, 'title')):
+            with self.subTest(field=field):
+                setattr(instance, field, 'Новое имя')
+                instance.save()
+                self.assertNotEqual(card_key(self.post, 'feed'), key)
+                key = card_key(self.post, 'feed')
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_thumbnail_built_outside_render(self):
+        """Пока миниатюры нет, выводится исходная картинка; после
+        построения — миниатюра."""
+        post_url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.assertIsNone(thumbnails.lookup(self.post.image))
+        self.assertContains(self.client.get(post_url), self.post.image.url)
+        self.assertIsNone(thumbnails.lookup(self.post.image))
+        thumbnails.submit(self.post.pk, self.post.image.name)
+        thumbnail = thumbnails.lookup(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertContains(self.client.get(post_url), thumbnail.url)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_broken_thumbnail_not_rescheduled(self):
+        """Неудачное построение не сбрасывает ленты и не повторяется
+        при каждом показе."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Битая картинка',
+            image=SimpleUploadedFile(
+                'broken.gif', b'not an image', content_type='image/gif'
+            ),
+        )
+        updated = Post.objects.get(pk=post.pk).updated
+        version = page_cache.get_version('index')
+        post_url = reverse('posts:post_detail', args=(post.pk,))
+        self.assertContains(self.client.get(post_url), post.image.url)
+        self.assertIn(post.image.name, thumbnails._pending)
+        with self.assertLogs('posts.workers', 'ERROR'):
+            thumbnails.submit(post.pk, post.image.name)
+        self.assertTrue(cache.get(thumbnails.failed_key(post.image.name)))
+        self.assertEqual(Post.objects.get(pk=post.pk).updated, updated)
+        self.assertEqual(page_cache.get_version('index'), version)
+        self.assertContains(self.client.get(post_url), post.image.url)
+        self.assertNotIn(post.image.name, thumbnails._pending)
 
 
 class FollowTests(TestCase):
@@ -218,7 +354,7 @@ class FollowTests(TestCase):
         response = self.authorized_follower.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), self.COUNT)
         post = response.context['page_obj'][self.FIRST_OBJECTS]
-        self.assertEqual(post.text, self.post.text)
+        self.assertEqual(post.excerpt_html, self.post.excerpt_html)
         self.assertEqual(post.author, self.post.author)
         response = self.authorized_following.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), self.FIRST_OBJECTS)
@@ -242,3 +378,652 @@ class FollowTests(TestCase):
             args=(self.following.username,))
         )
         self.assertEqual(count_follow, Follow.objects.count())
+
+    def test_timeline_follows_graph(self):
+        """Лента подписок наполняется при публикации и чистится
+        при отписке."""
+        Follow.objects.create(user=self.follower, author=self.following)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.follower, post=self.post)
+        )
+        new_post = Post.objects.create(
+            author=self.following,
+            text='Новый пост',
+        )
+        response = self.authorized_follower.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            response.context['page_obj'][self.FIRST_OBJECTS], new_post
+        )
+        self.authorized_follower.get(reverse(
+            'posts:profile_unfollow',
+            args=(self.following.username,))
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.follower))
+
+    def test_follow_is_unique(self):
+        """Повторная подписка не создаёт вторую строку в базе."""
+        Follow.objects.create(user=self.follower, author=self.following)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.follower, author=self.following)
+
+    def test_follow_single_statement(self):
+        """Подписка и отписка — по одному изменяющему запросу к Follow."""
+        for name in ('posts:profile_follow', 'posts:profile_unfollow'):
+            with self.subTest(name=name), CaptureQueriesContext(
+                connection
+            ) as queries:
+                self.authorized_follower.get(
+                    reverse(name, args=(self.following.username,))
+                )
+                writes = [
+                    query['sql'] for query in queries
+                    if 'posts_follow' in query['sql']
+                    and not query['sql'].startswith('SELECT')
+                ]
+                self.assertEqual(len(writes), 1)
+        self.assertEqual(self.follower.stats.follows_count, 0)
+
+    def test_follow_json(self):
+        """С ?format=json вместо редиректа приходит состояние подписки."""
+        cases = (
+            ('posts:profile_follow', {'following': True, 'changed': True}),
+            ('posts:profile_follow', {'following': True, 'changed': False}),
+            ('posts:profile_unfollow',
+             {'following': False, 'changed': True}),
+            ('posts:profile_unfollow',
+             {'following': False, 'changed': False}),
+        )
+        for name, expected in cases:
+            with self.subTest(name=name, expected=expected):
+                response = self.authorized_follower.get(
+                    reverse(name, args=(self.following.username,)),
+                    {'format': 'json'}
+                )
+                self.assertEqual(response.json(), {
+                    'author': self.following.username, **expected
+                })
+        response = self.authorized_follower.get(
+            reverse('posts:profile_follow', args=('nobody',)),
+            {'format': 'json'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_timeline_is_bounded(self):
+        """Лента подписок обрезается до TIMELINE_LENGTH записей."""
+        Follow.objects.create(user=self.follower, author=self.following)
+        for number in range(3):
+            Post.objects.create(
+                author=self.following,
+                text=f'Пост {number}',
+            )
+        self.assertEqual(
+            Timeline.objects.filter(user=self.follower).count(), 2
+        )
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_timeline_trim_is_set_based(self):
+        """Обрезка лент подписчиков не зависит от их числа."""
+        followers = [self.follower] + [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)
+        ]
+        for user in followers:
+            Follow.objects.create(user=user, author=self.following)
+        for number in range(2):
+            Post.objects.create(author=self.following, text=f'Пост {number}')
+        with CaptureQueriesContext(connection) as queries:
+            Post.objects.create(author=self.following, text='Последний')
+        deletes = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('DELETE FROM "posts_timeline"')
+        ]
+        self.assertEqual(len(deletes), 1)
+        for user in followers:
+            self.assertEqual(
+                Timeline.objects.filter(user=user).count(), 2
+            )
+
+
+@override_settings(FOLLOW_FEED='merge', AUTHOR_RECENT_POSTS=3,
+                   COUNT_OBJECTS=4)
+class MergedFollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='follower')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        for number in range(4):
+            for author in cls.authors:
+                Post.objects.create(author=author, text=f'Пост {number}')
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.follower, author=author)
+        cls.expected = list(Post.objects.filter(
+            author__in=cls.authors[:2]
+        ).order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_follower = Client()
+        self.authorized_follower.force_login(self.follower)
+
+    def test_merged_feed_matches_join(self):
+        """Слияние кэшированных списков даёт ту же ленту, что и JOIN,
+        включая страницы за пределами окна кэша."""
+        url = reverse('posts:follow_index')
+        first = self.authorized_follower.get(url).context['page_obj']
+        second = self.authorized_follower.get(
+            url + '?page=2'
+        ).context['page_obj']
+        self.assertEqual(first.paginator.count, len(self.expected))
+        self.assertEqual(list(first) + list(second), self.expected)
+
+    def test_merged_feed_uses_cache(self):
+        """Повторный запрос первой страницы не обращается к Follow⋈Post."""
+        url = reverse('posts:follow_index')
+        self.authorized_follower.get(url)
+        with self.assertNumQueries(4):
+            self.authorized_follower.get(url)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='admin'
+        )
+        cls.cat_post = Post.objects.create(
+            author=cls.user,
+            text='Кошка спит на подоконнике',
+        )
+        cls.cats_post = Post.objects.create(
+            author=cls.user,
+            text='Кошка, кошка и ещё раз кошка',
+        )
+        cls.dog_post = Post.objects.create(
+            author=cls.user,
+            text='Собака гуляет во дворе',
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_matches(self):
+        """Поиск находит посты по словам и префиксу, лучшие — первыми."""
+        self.assertEqual(self.search('кошка'), [
+            self.cats_post, self.cat_post
+        ])
+        self.assertEqual(self.search('соба'), [self.dog_post])
+        self.assertEqual(self.search('кошка двор'), [])
+        self.assertEqual(self.search('"*) OR ('), [])
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.get(pk=self.dog_post.pk)
+        post.text = 'Попугай говорит'
+        post.save()
+        self.assertEqual(self.search('собака'), [])
+        self.assertEqual(self.search('попугай'), [post])
+        post.delete()
+        self.assertEqual(self.search('попугай'), [])
+
+    def test_raw_save_is_not_indexed(self):
+        """Сохранение из фикстуры (raw) не трогает индекс."""
+        post = Post(
+            author=self.user, text='Жираф из фикстуры',
+            pub_date=timezone.now(), updated=timezone.now()
+        )
+        post.save_base(raw=True)
+        self.assertEqual(self.search('жираф'), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'подоконнике'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.cat_post]
+        )
+
+
+@override_settings(COMMENTS_PER_PAGE=2)
+class CommentPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {number}'
+            )
+            for number in range(5)
+        ]
+
+    def test_comments_count_is_stored(self):
+        """Число комментариев хранится в посте и следует за изменениями."""
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count, 5
+        )
+        Comment.objects.get(pk=self.comments[0].pk).delete()
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count, 4
+        )
+
+    def test_cascade_delete_does_not_scale_with_comments(self):
+        """Пост и пользователь удаляются с комментариями каскадом
+        за одно и то же число запросов; счётчики чужих постов верны."""
+        counts = []
+        for number in (2, 20):
+            commenter = User.objects.create_user(username=f'c{number}')
+            post = Post.objects.create(author=commenter, text='Пост')
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.user, text='К')
+                for _ in range(number)
+            )
+            Comment.objects.bulk_create(
+                Comment(post=self.post, author=commenter, text='К')
+                for _ in range(number)
+            )
+            stats.recount_comments(Post.objects.all())
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            with CaptureQueriesContext(connection) as user_queries:
+                commenter.delete()
+            counts.append((len(queries), len(user_queries)))
+            self.assertEqual(
+                Post.objects.get(pk=self.post.pk).comments_count, 5
+            )
+        self.assertEqual(counts[0], counts[1])
+
+    def test_post_detail_renders_first_page(self):
+        """На странице поста — только первая страница комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        self.assertEqual(
+            list(response.context['comments']), self.comments[:-3:-1]
+        )
+        self.assertContains(response, 'data-comments-more')
+
+    def test_more_comments(self):
+        """Следующие страницы отдаются фрагментом и в JSON без повторов."""
+        url = reverse('posts:post_comments', args=(self.post.pk,))
+        seen, after = [], ''
+        while after is not None:
+            data = self.client.get(
+                url, {'format': 'json', 'after': after}
+            ).json()
+            seen.extend(comment['id'] for comment in data['comments'])
+            after = data['next']
+        self.assertEqual(
+            seen, [comment.pk for comment in reversed(self.comments)]
+        )
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertNotContains(response, '<html')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='stamped')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='stamped-group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = (
+            (self.client, reverse('posts:home_page')),
+            (self.client, reverse(
+                'posts:group_posts', args=(self.group.slug,)
+            )),
+            (self.client, reverse(
+                'posts:profile', args=(self.author.username,)
+            )),
+            (self.client, reverse(
+                'posts:post_detail', args=(self.post.pk,)
+            )),
+            (self.reader_client, reverse('posts:follow_index')),
+        )
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без запросов к лентам."""
+        for client, url in self.urls:
+            with self.subTest(url=url):
+                etag = client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse([
+                    query for query in queries
+                    if 'posts_post' in query['sql']
+                    and 'posts_changestamp' not in query['sql']
+                ])
+
+    def test_changes_invalidate_validators(self):
+        """Пост, комментарий и подписка меняют валидаторы своих страниц."""
+        etags = {url: client.get(url)['ETag'] for client, url in self.urls}
+        Comment.objects.create(post=self.post, author=self.reader, text='К')
+        Post.objects.create(author=self.author, text='Новый пост')
+        for client, url in self.urls:
+            with self.subTest(url=url):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+
+    def test_comment_does_not_fan_out(self):
+        """Комментарий меняет страницу поста, но не ленты подписчиков."""
+        follow_client, follow_url = self.urls[-1]
+        _, post_url = self.urls[-2]
+        follow_etag = follow_client.get(follow_url)['ETag']
+        post_etag = self.client.get(post_url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='К'
+            )
+        self.assertFalse([
+            query for query in queries if 'posts_follow' in query['sql']
+        ])
+        response = follow_client.get(
+            follow_url, HTTP_IF_NONE_MATCH=follow_etag
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(post_url, HTTP_IF_NONE_MATCH=post_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_validator_is_one_lookup(self):
+        """Валидатор — один запрос по первичному ключу отметок."""
+        for lookups in (
+            [('group', self.group.slug)],
+            [('author', self.author.username)],
+            [('post_author', self.post.pk)],
+        ):
+            with self.subTest(lookups=lookups):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertIsNotNone(stamps.latest(
+                        ['index', f'follow:{self.reader.pk}'], lookups
+                    ))
+                self.assertEqual(len(queries), 1)
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'EXPLAIN QUERY PLAN ' + queries[0]['sql']
+                    )
+                    plan = [row[-1] for row in cursor.fetchall()]
+                self.assertFalse(query_plans.problems(plan), plan)
+                self.assertTrue(all(
+                    line.startswith(('SEARCH', 'LIST SUBQUERY',
+                                     'SCALAR SUBQUERY'))
+                    for line in plan
+                ), plan)
+
+
+class StaleReplicaTests(TransactionTestCase):
+    # Снимок базы нельзя снять внутри незавершённой транзакции TestCase
+    REPLICA = 'stale'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[cls.REPLICA] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[cls.REPLICA].close()
+        del connections[cls.REPLICA]
+        del connections.databases[cls.REPLICA]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='lagging')
+        Post.objects.create(author=self.author, text='Старый пост')
+
+    def catch_up(self):
+        """Реплика получает снимок primary."""
+        connections[self.REPLICA].close()
+        connection.ensure_connection()
+        with closing(sqlite3.connect(
+            connections.databases[self.REPLICA]['NAME']
+        )) as replica:
+            connection.connection.backup(replica)
+
+    @override_settings(REPLICA_DATABASES=[REPLICA])
+    def test_stale_replica_keeps_old_keys(self):
+        """Страница с отстающей реплики не кэшируется под новой версией
+        и не получает новый ETag."""
+        cache.clear()
+        url = reverse('posts:home_page')
+        self.catch_up()
+        Post.objects.create(author=self.author, text='Новый пост')
+        stale = self.client.get(url)
+        self.assertNotContains(stale, 'Новый пост')
+        self.client.cookies[settings.REPLICA_PIN_COOKIE] = '1'
+        pinned = self.client.get(url, HTTP_IF_NONE_MATCH=stale['ETag'])
+        self.assertContains(pinned, 'Новый пост')
+        self.assertEqual(pinned.context['page_obj'].paginator.count, 2)
+        del self.client.cookies[settings.REPLICA_PIN_COOKIE]
+        self.catch_up()
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=stale['ETag'])
+        self.assertContains(fresh, 'Новый пост')
+        self.assertEqual(fresh.context['page_obj'].paginator.count, 2)
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api-author')
+        cls.reader = User.objects.create_user(username='api-reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            for i in range(5)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds(self):
+        """Все ленты отдают посты автора в JSON от новых к старым."""
+        expected = [post.pk for post in reversed(self.posts)]
+        for client, url in (
+            (self.client, reverse('posts:api_index')),
+            (self.client, reverse('posts:api_group', args=['api-group'])),
+            (self.client, reverse('posts:api_profile', args=['api-author'])),
+            (self.reader_client, reverse('posts:api_follow')),
+        ):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [item['id'] for item in response.json()['results']],
+                    expected
+                )
+
+    def test_fields(self):
+        """?fields= оставляет в ответе только запрошенные поля."""
+        response = self.client.get(
+            reverse('posts:api_post', args=[self.posts[0].pk]),
+            {'fields': 'text,author,group'}
+        )
+        self.assertEqual(response.json(), {
+            'text': 'Пост 0', 'author': 'api-author', 'group': 'api-group',
+        })
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'text,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_image_url_from_storage(self):
+        """Ссылку на картинку строит хранилище файлов."""
+        post = self.posts[0]
+        Post.objects.filter(pk=post.pk).update(image='posts/a b.gif')
+        response = self.client.get(
+            reverse('posts:api_post', args=[post.pk]), {'fields': 'image'}
+        )
+        self.assertEqual(
+            response.json(), {'image': settings.MEDIA_URL + 'posts/a%20b.gif'}
+        )
+
+    def test_cursor(self):
+        """Курсор next проходит ленту без пропусков и повторов."""
+        seen, after = [], None
+        while True:
+            params = {'fields': 'id', 'limit': 2}
+            if after:
+                params['after'] = after
+            data = self.client.get(
+                reverse('posts:api_index'), params
+            ).json()
+            seen += [item['id'] for item in data['results']]
+            after = data['next']
+            if after is None:
+                break
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+        response = self.client.get(
+            reverse('posts:api_index'), {'after': 'мусор'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_one_query_without_models(self):
+        """Страница — один запрос к постам, без шаблонов и экземпляров."""
+        stamps.reset()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:api_index'))
+        self.assertEqual(
+            len([q for q in queries if 'posts_post' in q['sql']]), 1
+        )
+        self.assertFalse(response.templates)
+
+    def test_not_found_and_anonymous(self):
+        """Неизвестные объекты — 404, лента подписок без входа — 401."""
+        for url in (
+            reverse('posts:api_post', args=[0]),
+            reverse('posts:api_group', args=['missing']),
+            reverse('posts:api_profile', args=['missing']),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(reverse('posts:api_follow'))
+        self.assertEqual(response.status_code, 401)
+
+
+class FeedExcerptTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='long-reads', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Начало. ' + 'середина ' * 200 + 'Конец.'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_skip_full_text(self):
+        """Ленты показывают анонс и не читают полный текст из базы."""
+        reader = Client()
+        reader.force_login(self.reader)
+        for client, url in (
+            (self.client, reverse('posts:home_page')),
+            (self.client, reverse('posts:group_posts', args=['long-reads'])),
+            (self.client, reverse('posts:profile', args=['writer'])),
+            (reader, reverse('posts:follow_index')),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                self.assertContains(response, 'Начало.')
+                self.assertNotContains(response, 'Конец.')
+                self.assertContains(response, reverse(
+                    'posts:post_detail', args=[self.post.pk]
+                ))
+                self.assertFalse([
+                    query for query in queries
+                    if '"posts_post"."text"' in query['sql']
+                ])
+
+    def test_detail_shows_full_text(self):
+        """На странице поста — полный текст."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertContains(response, 'Конец.')
+
+
+class FeedRowsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='rows', first_name='Анна', last_name='Строкова'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='rows-group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group, text='1'),
+            Post.objects.create(author=cls.author, text='2'),
+        ]
+
+    def test_records_match_models(self):
+        """PostRow отдаёт то же, что карточке нужно от Post."""
+        records = list(rows.records(Post.objects.all()))
+        self.assertEqual(records, self.posts[::-1])
+        ungrouped, grouped = records
+        self.assertEqual(grouped.id, self.posts[0].pk)
+        self.assertEqual(grouped.author, self.author)
+        self.assertIs(grouped.author, ungrouped.author)
+        self.assertEqual(grouped.author.get_full_name(), 'Анна Строкова')
+        self.assertEqual(grouped.group, self.group)
+        self.assertEqual(grouped.group.slug, 'rows-group')
+        self.assertIsNone(ungrouped.group)
+        self.assertFalse(grouped.image)
+        self.assertEqual(grouped.excerpt_html, '<p>1</p>')
+        with self.assertRaises(AttributeError):
+            grouped.pk = 0
+
+    def test_feed_pages_use_records(self):
+        """Главная строится из PostRow, карточка видит автора и группу."""
+        cache.clear()
+        response = self.client.get(reverse('posts:home_page'))
+        self.assertIsInstance(
+            response.context['page_obj'][0], rows.PostRow
+        )
+        self.assertContains(response, 'Анна Строкова')
+        self.assertContains(
+            response, reverse('posts:group_posts', args=['rows-group'])
+        )
@@ -0,0 +1,146 @@
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings as s
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import page_cache, workers
+from .models import Post
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+FAILED_KEY = 'posts:thumbnail:failed:{}'
+
+_executor = None
+_pending = set()
+
+
+def thumbnail_file(image):
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(OPTIONS)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(thumbnail_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, GEOMETRY, options)
+    return ImageFile(name, default.storage)
+
+
+def lookup(image):
+    """Готовая миниатюра из KV-хранилища sorl или None; Pillow не нужен."""
+    return default.kvstore.get(thumbnail_file(image))
+
+
+def prefetch(images):
+    """Загружает записи KV-хранилища для страницы одним запросом."""
+    kv_cache = getattr(default.kvstore, 'cache', None)
+    if kv_cache is None:
+        return
+    keys = [
+        add_prefix(thumbnail_file(image).key, 'image')
+        for image in images if image
+    ]
+    missing = set(keys) - set(kv_cache.get_many(keys))
+    if not missing:
+        return
+    found = dict(KVStoreModel.objects.filter(
+        key__in=missing
+    ).values_list('key', 'value'))
+    kv_cache.set_many(
+        {key: found.get(key, EMPTY_VALUE) for key in missing},
+        thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+    )
+
+
+def forget_miss(name):
+    # cached_db KVStore кэширует промахи, а миниатюру записал другой процесс.
+    kv_cache = getattr(default.kvstore, 'cache', None)
+    if kv_cache is not None:
+        kv_cache.delete(add_prefix(thumbnail_file(name).key, 'image'))
+
+
+def failed_key(name):
+    return FAILED_KEY.format(hashlib.md5(name.encode()).hexdigest())
+
+
+def finished(post_id, name, built):
+    """Итог построения: готовую миниатюру показываем, неудачу запоминаем.
+
+    Без отметки о неудаче каждый показ битой картинки снова ставил бы
+    её в очередь.
+    """
+    if built:
+        ready(post_id, name)
+        return
+    _pending.discard(name)
+    cache.set(failed_key(name), True, s.THUMBNAIL_RETRY_TIMEOUT)
+
+
+def ready(post_id, name):
+    _pending.discard(name)
+    forget_miss(name)
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if post is None:
+        return
+    Post.objects.filter(pk=post_id).update(updated=timezone.now())
+    page_cache.bump(*page_cache.post_namespaces(*post))
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=s.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=workers.setup,
+        )
+    return _executor
+
+
+def submit(post_id, name):
+    # Отдельный процесс не увидит базу в памяти (тесты) — строим на месте.
+    if not s.THUMBNAIL_WORKERS or connection.is_in_memory_db():
+        finished(
+            post_id, name, workers.build_thumbnail(name, GEOMETRY, OPTIONS)
+        )
+        return
+
+    def on_done(future):
+        try:
+            finished(
+                post_id, name,
+                not future.cancelled() and future.exception() is None
+                and future.result()
+            )
+        finally:
+            connections.close_all()
+
+    get_executor().submit(
+        workers.build_thumbnail, name, GEOMETRY, OPTIONS
+    ).add_done_callback(on_done)
+
+
+def schedule(post):
+    """Ставит построение миниатюры в очередь после коммита транзакции."""
+    name = post.image.name
+    if not name or name in _pending or cache.get(failed_key(name)):
+        return
+    _pending.add(name)
+    transaction.on_commit(lambda: submit(post.pk, name))
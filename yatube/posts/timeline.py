@@ -0,0 +1,74 @@
+from django.conf import settings as s
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from .models import Follow, Post, Timeline
+
+User = get_user_model()
+
+
+def trim(users):
+    """Обрезает ленты до TIMELINE_LENGTH записей одним DELETE.
+
+    users — queryset со столбцом id пользователей: число запросов
+    не зависит от числа лент.
+    """
+    users_sql, params = users.query.sql_with_params()
+    table = connection.ops.quote_name(Timeline._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+            f'PARTITION BY user_id ORDER BY pub_date DESC, id DESC'
+            f') AS position FROM {table} WHERE user_id IN ({users_sql})'
+            f') AS ranked WHERE position > %s)',
+            [*params, s.TIMELINE_LENGTH]
+        )
+
+
+def fan_out(post):
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).distinct()
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers),
+        ignore_conflicts=True
+    )
+    trim(followers)
+
+
+def backfill(user_id, author_id):
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )[:s.TIMELINE_LENGTH]
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts),
+        ignore_conflicts=True
+    )
+    trim(User.objects.filter(pk=user_id).values('pk'))
+
+
+def remove(user_id, author_id):
+    post_ids = Post.objects.filter(author_id=author_id).values('pk')
+    Timeline.objects.filter(user_id=user_id, post__in=post_ids).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту пользователя с нуля (после массового импорта)."""
+    posts = Post.objects.filter(author__following__user_id=user_id).order_by(
+        '-pub_date'
+    ).values_list('pk', 'pub_date').distinct()[:s.TIMELINE_LENGTH]
+    Timeline.objects.filter(user_id=user_id).delete()
+    Timeline.objects.bulk_create(
+        Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts
+    )
+
+
+def feed(user):
+    # id записи ленты, а не поста: порядок целиком берётся из индекса.
+    return Post.objects.filter(timeline__user=user).order_by(
+        '-timeline__pub_date', '-timeline__id'
+    )
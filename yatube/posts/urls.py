@@ -9,8 +9,19 @@ urlpatterns = [
     path('', views.index, name='home_page'),
     path('create/', views.post_create, name='post_create'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.post_search, name='search'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path(
+        'group/<slug:slug>/export/',
+        views.group_export,
+        name='group_export'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/export/',
+        views.profile_export,
+        name='profile_export'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -22,10 +33,24 @@ urlpatterns = [
         name='profile_unfollow'
     ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'
     ),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path('api/posts/', views.api_index, name='api_index'),
+    path('api/posts/<int:post_id>/', views.api_post, name='api_post'),
+    path('api/group/<slug:slug>/', views.api_group, name='api_group'),
+    path(
+        'api/profile/<str:username>/',
+        views.api_profile,
+        name='api_profile'
+    ),
+    path('api/follow/', views.api_follow, name='api_follow'),
 ]
@@ -1,33 +1,172 @@
-import time
-import functools
+import base64
+import binascii
+from contextlib import contextmanager
 
 from django.conf import settings as s
-from django.core.paginator import Paginator
-from django.db import connection, reset_queries
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
+from . import page_cache
+
+
+def encode_cursor(pub_date, pk):
+    raw = f'{pub_date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        pub_date, pk = raw.decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class KeysetPage(Page):
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 cursor=''):
+        super().__init__(object_list, 1, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.cursor = cursor
+
+    def __repr__(self):
+        return f'<KeysetPage {self.cursor or "first"}>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(getattr(last, self.paginator.field), last.pk)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(getattr(first, self.paginator.field), first.pk)
 
-def paginators(request, posts):
-    paginator = Paginator(posts, s.COUNT_OBJECTS)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
 
+class KeysetPaginator(Paginator):
+    """Постраничный вывод по курсору (дата, id) без COUNT и OFFSET."""
 
-def query_debugger(func):
-    @functools.wraps(func)
-    def inner_func(*args, **kwargs):
-        reset_queries()
+    keyset = True
 
-        start_queries = len(connection.queries)
+    def __init__(self, object_list, per_page, field='pub_date'):
+        self.field = field
+        super().__init__(
+            object_list.order_by(f'-{field}', '-pk'), per_page
+        )
 
-        start = time.perf_counter()
-        result = func(*args, **kwargs)
-        end = time.perf_counter()
+    # Граница по дате отдельно от OR — иначе нет поиска по индексу.
+    @staticmethod
+    def after(queryset, date, pk, field='pub_date'):
+        return queryset.filter(
+            Q(**{f'{field}__lt': date}) | Q(pk__lt=pk),
+            **{f'{field}__lte': date}
+        )
 
-        end_queries = len(connection.queries)
+    @staticmethod
+    def before(queryset, date, pk, field='pub_date'):
+        return queryset.filter(
+            Q(**{f'{field}__gt': date}) | Q(pk__gt=pk),
+            **{f'{field}__gte': date}
+        ).order_by(field, 'pk')
+
+    def get_keyset_page(self, after=None, before=None):
+        after = decode_cursor(after)
+        before = decode_cursor(before) if after is None else None
+        if before is not None:
+            date, pk = before
+            rows = list(self.before(
+                self.object_list, date, pk, self.field
+            )[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return KeysetPage(
+                rows, self, True, has_previous, 'b' + encode_cursor(*before)
+            )
+        queryset = self.object_list
+        if after is not None:
+            date, pk = after
+            queryset = self.after(queryset, date, pk, self.field)
+        rows = list(queryset[:self.per_page + 1])
+        cursor = 'a' + encode_cursor(*after) if after is not None else ''
+        return KeysetPage(
+            rows[:self.per_page], self,
+            len(rows) > self.per_page, after is not None, cursor
+        )
+
+
+class WindowedPaginator(Paginator):
+    """Номерной вывод с окном ссылок и числом постов из кэша ленты."""
+
+    keyset = False
+    approximate = False
+
+    def __init__(self, object_list, per_page, scope=None):
+        super().__init__(object_list, per_page)
+        self.scope = scope
+
+    @cached_property
+    def count(self):
+        if self.scope is None or not isinstance(self.object_list, QuerySet):
+            return super().count
+        total, self.approximate = page_cache.count(
+            self.scope, self.object_list
+        )
+        return total
+
+    def window(self, number):
+        """Номера страниц вокруг number — вместо всего page_range."""
+        first = max(number - s.PAGINATION_WINDOW, 1)
+        last = min(number + s.PAGINATION_WINDOW, self.num_pages)
+        return range(first, last + 1)
+
+
+def for_cards(posts):
+    """Ленты без полного текста: карточке хватает анонса."""
+    return posts.defer('text', 'text_html')
+
+
+def paginators(request, posts, keyset=True, scope=None):
+    if (
+        keyset and s.PAGINATION_MODE == 'cursor'
+        and isinstance(posts, QuerySet)
+    ):
+        paginator = KeysetPaginator(posts, s.COUNT_OBJECTS)
+        return paginator.get_keyset_page(
+            request.GET.get('after'), request.GET.get('before')
+        )
+    paginator = WindowedPaginator(posts, s.COUNT_OBJECTS, scope)
+    page_number = request.GET.get('page')
+    return paginator.get_page(page_number)
 
-        print(f"Function : {func.__name__}")
-        print(f"Number of Queries : {end_queries - start_queries}")
-        print(f"Finished in : {(end - start):.2f}s")
-        return result
 
-    return inner_func
+@contextmanager
+def keep_dates(*fields):
+    """Отключает auto_now/auto_now_add, чтобы сохранить даты из источника."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field, _, _ in saved:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
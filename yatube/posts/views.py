@@ -1,63 +1,148 @@
+from urllib.parse import urlencode
+
+from django.conf import settings as s
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core import writer
 
-from .forms import CommentForm, PostForm
+from . import (
+    api, export, follows, merge, page_cache, rows, search, stamps,
+    thumbnails, timeline
+)
+from .forms import CommentForm, PostForm, SearchForm
 from .models import Follow, Group, Post
-from .utils import paginators
+from .utils import KeysetPaginator, for_cards, paginators
 
 User = get_user_model()
 
 
-# @query_debugger
+def index_scopes(request):
+    return {'scopes': ['index']}
+
+
+def group_scopes(request, slug):
+    return {'lookups': [('group', slug)]}
+
+
+def post_scopes(request, post_id):
+    return {
+        'scopes': [f'post:{post_id}'],
+        'lookups': [('post_author', post_id)],
+    }
+
+
+def follow_scopes(request):
+    return {'scopes': [f'follow:{request.user.pk}']}
+
+
+@stamps.conditional(index_scopes)
 def index(request):
-    posts = Post.objects.select_related('author', 'group').all()
-    context = {'page_obj': paginators(request, posts)}
+    posts = rows.for_feed(Post.objects.select_related('author', 'group'))
+    context = {
+        'page_obj': paginators(request, posts, scope='index'),
+        **page_cache.context('index'),
+    }
     return render(request, 'posts/index.html', context)
 
 
-# @query_debugger
+@stamps.conditional(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author').all()
+    posts = rows.for_feed(group.posts.select_related('author'))
     context = {
-        'page_obj': paginators(request, posts),
-        'group': group
+        'page_obj': paginators(request, posts, scope=f'group:{group.pk}'),
+        'group': group,
+        **page_cache.context(f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
-# @query_debugger
+def profile_scopes(request, username):
+    # Кнопка подписки зависит от подписок смотрящего
+    scopes = []
+    if request.user.is_authenticated:
+        scopes.append(f'follow:{request.user.pk}')
+    return {'scopes': scopes, 'lookups': [('author', username)]}
+
+
+@stamps.conditional(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group').all()
-    author = User.objects.get(username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = rows.for_feed(author.posts.select_related('group'))
     following = request.user.is_authenticated and author.following.filter(
         user=request.user
     )
     context = {
-        'page_obj': paginators(request, posts),
+        'page_obj': paginators(request, posts, scope=f'author:{author.pk}'),
         'author': author,
         'following': following,
+        **page_cache.context(f'author:{author.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def post_search(request):
+    form = SearchForm(request.GET or None)
+    context = {'form': form}
+    if form.is_valid():
+        query = form.cleaned_data['q']
+        posts = search.search(
+            for_cards(Post.objects.select_related('author', 'group')), query
+        )
+        context['page_obj'] = paginators(request, posts, keyset=False)
+        context['page_query'] = urlencode({'q': query}) + '&'
+    return render(request, 'posts/search.html', context)
+
+
+def comments_page(post, after=None):
+    paginator = KeysetPaginator(
+        post.comments.select_related('author'), s.COMMENTS_PER_PAGE,
+        field='created'
+    )
+    return paginator.get_keyset_page(after)
+
+
+@stamps.conditional(post_scopes)
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.prefetch_related('comments__author'),
+        Post.objects.select_related('author__stats', 'group'),
         id=post_id
     )
     form = CommentForm()
     context = {
         'post': post,
         'form': form,
-        'comments': post.comments.all(),
+        'comments': comments_page(post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующие страницы комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    comments = comments_page(post, request.GET.get('after'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [{
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            } for comment in comments],
+            'next': comments.next_cursor,
+        })
+    return render(request, 'posts/includes/comment_list.html', {
+        'post': post,
+        'comments': comments,
+    })
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -65,7 +150,10 @@ def post_create(request):
         return render(request, 'posts/post_create.html', {'form': form})
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    with writer.atomic():
+        post.save()
+    if post.image:
+        thumbnails.schedule(post)
     return redirect('posts:profile', request.user)
 
 
@@ -79,7 +167,10 @@ def post_edit(request, post_id):
                     instance=post)
     if not form.is_valid():
         return render(request, 'posts/post_create.html', {'form': form})
-    form.save()
+    with writer.atomic():
+        post = form.save()
+    if post.image and 'image' in form.changed_data:
+        thumbnails.schedule(post)
     return redirect('posts:post_detail', post_id)
 
 
@@ -91,35 +182,155 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with writer.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@stamps.conditional(follow_scopes)
 def follow_index(request):
-    posts = Post.objects.select_related('author', 'group').filter(
-        author__following__user=request.user
-    )
+    if s.FOLLOW_FEED == 'merge':
+        posts = merge.MergedFeed(request.user)
+    else:
+        posts = rows.for_feed(timeline.feed(request.user).select_related(
+            'author', 'group'
+        ))
     context = {'page_obj': paginators(request, posts)}
     return render(request, 'posts/follow.html', context)
 
 
+def follow_response(request, username, following):
+    """Для ?format=json — состояние подписки вместо редиректа на профиль.
+
+    following=None: запрос ничего не изменил, состояние берётся из базы.
+    """
+    if request.GET.get('format') != 'json':
+        return redirect('posts:profile', username=username)
+    changed = following is not None
+    if not changed:
+        author = get_object_or_404(User, username=username)
+        following = Follow.objects.filter(
+            user=request.user, author=author
+        ).exists()
+    return JsonResponse({
+        'author': username,
+        'following': following,
+        'changed': changed,
+    })
+
+
 @login_required
 def profile_follow(request, username):
-    author = User.objects.get(username=username)
-    if request.user != author:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=User.objects.get(username=username)
-        )
-    return redirect('posts:profile', username=username)
+    created = follows.follow(request.user, username) is not None
+    return follow_response(request, username, True if created else None)
 
 
 @login_required
 def profile_unfollow(request, username):
-    get_object_or_404(
-        Follow,
-        author__username=username,
-        user=request.user
-    ).delete()
-    return redirect('posts:profile', username=username)
+    deleted = follows.unfollow(request.user, username) is not None
+    return follow_response(request, username, False if deleted else None)
+
+
+def export_response(request, rows, name):
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in export.FORMATS:
+        raise Http404
+    render_rows, content_type = export.FORMATS[export_format]
+    response = StreamingHttpResponse(
+        render_rows(rows), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{export_format}"'
+    )
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    return export_response(
+        request, export.author_records(author), f'yatube-{author.username}'
+    )
+
+
+@login_required
+def group_export(request, slug):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(
+        request, export.group_records(group), f'yatube-group-{group.slug}'
+    )
+
+
+def api_error(message, status):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def api_page(request, posts):
+    """Страница ленты в JSON из кортежей values_list, без моделей."""
+    try:
+        data = api.page(
+            posts,
+            api.parse_fields(request.GET.get('fields')),
+            request.GET.get('after'),
+            api.parse_limit(request.GET.get('limit')),
+        )
+    except api.ApiError as error:
+        return api_error(str(error), 400)
+    return JsonResponse(data)
+
+
+@stamps.conditional(index_scopes)
+def api_index(request):
+    return api_page(request, Post.objects.all())
+
+
+@stamps.conditional(group_scopes)
+def api_group(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return api_error('Группа не найдена', 404)
+    return api_page(request, Post.objects.filter(group_id=group_id))
+
+
+@stamps.conditional(profile_scopes)
+def api_profile(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return api_error('Автор не найден', 404)
+    return api_page(request, Post.objects.filter(author_id=author_id))
+
+
+def api_follow(request):
+    if not request.user.is_authenticated:
+        return api_error('Нужна авторизация', 401)
+    return api_follow_page(request)
+
+
+@stamps.conditional(follow_scopes)
+def api_follow_page(request):
+    if s.FOLLOW_FEED == 'timeline':
+        posts = Post.objects.filter(timeline__user=request.user)
+    else:
+        posts = Post.objects.filter(author__following__user=request.user)
+    return api_page(request, posts)
+
+
+@stamps.conditional(post_scopes)
+def api_post(request, post_id):
+    try:
+        fields = api.parse_fields(request.GET.get('fields'))
+    except api.ApiError as error:
+        return api_error(str(error), 400)
+    post = api.detail(Post.objects.all(), post_id, fields)
+    if post is None:
+        return api_error('Пост не найден', 404)
+    return JsonResponse(post)
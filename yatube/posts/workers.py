@@ -0,0 +1,25 @@
+"""Задачи для пула процессов: модуль не импортирует модели до setup()."""
+import logging
+
+import django
+
+logger = logging.getLogger(__name__)
+
+
+def setup():
+    django.setup()
+
+
+def build_thumbnail(name, geometry, options):
+    from sorl.thumbnail import default, get_thumbnail
+
+    try:
+        thumbnail = get_thumbnail(name, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s', name)
+        return False
+    # Нечитаемый источник sorl только пишет в лог и миниатюру не сохраняет
+    if default.kvstore.get(thumbnail) is None:
+        logger.error('Не удалось построить миниатюру %s', name)
+        return False
+    return True
@@ -33,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,13 +72,63 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# WAL пускает читателей параллельно с писателем, synchronous=NORMAL
+# в WAL не теряет целостность при падении процесса. timeout — сколько
+# секунд соединение ждёт блокировку записи.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {'timeout': 20},
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,
+            'temp_store': 'MEMORY',
+        },
+        'TRANSACTION_MODE': 'IMMEDIATE',
     }
 }
 
+# Пишущие транзакции потоков одного процесса идут по очереди (core.writer)
+WRITE_QUEUE = os.environ.get('YATUBE_WRITE_QUEUE', '') == '1'
+
+# Реплики для чтения. Локально: YATUBE_REPLICAS=2 добавит файлы
+# db.replica1.sqlite3, db.replica2.sqlite3; их догоняет команда replicate.
+REPLICA_DATABASES = []
+for number in range(1, int(os.environ.get('YATUBE_REPLICAS', 0)) + 1):
+    REPLICA_DATABASES.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, f'db.replica{number}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Модели этих приложений читаются с реплик; сессии и прочее — с primary
+REPLICA_APPS = ('posts', 'auth')
+
+REPLICA_VIEWS = (
+    'posts:home_page',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:follow_index',
+    'posts:search',
+    'posts:api_index',
+    'posts:api_post',
+    'posts:api_group',
+    'posts:api_profile',
+    'posts:api_follow',
+)
+
+# Сколько секунд после записи клиент читает только с primary
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'primary_pin'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -108,6 +160,50 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 COUNT_OBJECTS = 10
 
+COMMENTS_PER_PAGE = 20
+
+# Строки лент: records — компактные PostRow из values_list,
+# models — экземпляры Post без полного текста
+FEED_ROWS = 'records'
+
+# Длина анонса поста в карточках лент, символов
+POST_EXCERPT_LENGTH = 500
+
+# 'pages' — ?page=N, 'cursor' — ?after=/?before= по (pub_date, id)
+PAGINATION_MODE = 'pages'
+
+# Ссылок на страницы по каждую сторону от текущей
+PAGINATION_WINDOW = 3
+
+# Число постов ленты от этого порога может отставать на
+# PAGINATION_APPROX_TIMEOUT секунд вместо COUNT(*) после каждого поста
+PAGINATION_APPROX_COUNT = 10_000
+PAGINATION_APPROX_TIMEOUT = 60
+
+# Сколько последних постов хранится в ленте подписок пользователя
+TIMELINE_LENGTH = 1000
+
+# Лента подписок: 'timeline' — fan-out при публикации,
+# 'merge' — слияние кэшированных списков последних постов авторов
+FOLLOW_FEED = 'timeline'
+
+AUTHOR_RECENT_POSTS = 200
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Страницы лент сбрасываются по событиям, таймаут лишь страхует
+FEED_PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Процессы для фонового построения миниатюр; 0 — строить сразу после коммита
+THUMBNAIL_WORKERS = 2
+# Сколько секунд не пытаться снова построить миниатюру битой картинки
+THUMBNAIL_RETRY_TIMEOUT = 60 * 60 * 24
+
+# Строк на одну выборку при потоковой выгрузке
+EXPORT_CHUNK_SIZE = 2000
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:home_page'
@@ -120,8 +216,30 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Общий для всех процессов кэш в файле SQLite: фрагменты лент, версии
+# и данные sorl-thumbnail видны каждому воркеру, сброс — тоже.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.backends.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'KEY_FUNCTION': 'core.backends.cache.database_key',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+            'MAX_BYTES': 256 * 1024 * 1024,
+        },
     }
 }
+
+# Бюджеты на запрос по имени представления ('*' — для остальных).
+# Ключи: queries, duplicates, db_ms, template_ms, total_ms
+QUERY_BUDGETS = {
+    '*': {'queries': 30, 'duplicates': 8},
+    'posts:home_page': {'queries': 8, 'duplicates': 2},
+    'posts:group_posts': {'queries': 8, 'duplicates': 2},
+    'posts:profile': {'queries': 9, 'duplicates': 2},
+    'posts:post_detail': {'queries': 8, 'duplicates': 2},
+    'posts:follow_index': {'queries': 12, 'duplicates': 2},
+}
+
+# 'warn' — предупреждение в лог, 'fail' — исключение QueryBudgetExceeded
+QUERY_BUDGET_MODE = 'warn'
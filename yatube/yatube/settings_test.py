@@ -0,0 +1,9 @@
+from .settings import *  # noqa: F401,F403
+
+# Тесты не трогают файл кэша рабочих процессов
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    }
+}
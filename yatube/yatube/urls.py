@@ -5,7 +5,7 @@ from django.urls import include, path
 
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
-handler403 = 'core.views.csrf_failure'
+handler403 = 'core.views.permission_denied'
 
 urlpatterns = [
     path('about/', include('about.urls', namespace='about')),